@@ -0,0 +1,57 @@
+"""
+Measures the cost of Ollama model reloads caused by changing `num_ctx`.
+
+Sends the same sequence of growing prompts twice against a live Ollama server:
+once with the exact `num_ctx` estimate per call (the old behaviour) and once with
+the bucketed ContextWindowPolicy, and reports the time Ollama spent loading.
+
+Usage:
+    python benchmarks/context_window.py [model_name] [calls]
+"""
+
+import sys
+import time
+import ollama
+
+sys.path.insert(0, ".")
+from kollektiv.llm.context import ContextWindowPolicy
+
+
+def _prompts(calls: int) -> list[str]:
+    words = ("lorem ipsum dolor sit amet consectetur adipiscing elit " * 2000).split()
+    return [" ".join(words[: 150 * (i + 1)]) for i in range(calls)]
+
+
+def _run(model_name: str, prompts: list[str], num_ctx_for) -> tuple[float, float, int]:
+    # unload the model so both strategies start cold
+    ollama.chat(model_name, messages=[], keep_alive=0)
+
+    load_seconds, loads = 0.0, 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        required = int(len(prompt.split()) * 1.5)
+        response = ollama.chat(
+            model_name,
+            messages=[{"role": "user", "content": f"{prompt}\nReply with 'ok'."}],
+            options={"num_ctx": num_ctx_for(required), "num_predict": 4},
+        )
+        seconds = (response.load_duration or 0) / 1e9
+        load_seconds += seconds
+        loads += seconds >= ContextWindowPolicy.RELOAD_THRESHOLD_SECONDS
+    return time.perf_counter() - start, load_seconds, loads
+
+
+if __name__ == "__main__":
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "qwen3:32b"
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    prompts = _prompts(calls)
+
+    policy = ContextWindowPolicy(model_name)
+    results = {
+        "exact": _run(model_name, prompts, lambda required: required),
+        "bucketed": _run(model_name, prompts, policy.resolve),
+    }
+
+    print(f"{'strategy':<10} {'wall [s]':>10} {'load [s]':>10} {'loads':>6}")
+    for name, (wall, load, loads) in results.items():
+        print(f"{name:<10} {wall:>10.2f} {load:>10.2f} {loads:>6}")
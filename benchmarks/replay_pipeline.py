@@ -0,0 +1,61 @@
+"""
+Runs the full pipeline against a ReplayServer instead of a live model.
+
+Record a cassette once on a machine with a GPU:
+    System(goal=goal, cassette_path="run.jsonl").run()
+
+Then benchmark or profile anywhere:
+    python benchmarks/replay_pipeline.py run.jsonl goal.txt --latency 0.2 --workers 4
+
+Phase 1 browses the web; pass `--research` with the research.txt of the recorded
+run to skip it and stay offline.
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+from kollektiv import System
+from kollektiv.llm import Storage, ReplayServer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cassette")
+    parser.add_argument("goal_file")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--speed", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--research", default=None)
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.goal_file, "r", encoding="utf-8") as file:
+        goal = file.read().strip()
+
+    Storage.directory = tempfile.mkdtemp(prefix="kollektiv_replay_")
+    if args.research:
+        shutil.copy(args.research, os.path.join(Storage.directory, "research.txt"))
+
+    with ReplayServer(args.cassette, latency=args.latency, speed=args.speed) as replay:
+        system = System(goal=goal, workers=args.workers, host=replay.url)
+
+        profiler = cProfile.Profile() if args.profile else None
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        system.run()
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+    print(f"Output directory: {Storage.directory}")
+    print(f"Recorded responses: {len(replay.entries)}")
+    print(f"Wall-clock time: {elapsed:.2f}s")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
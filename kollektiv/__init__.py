@@ -1 +1,2 @@
-from .system import System
\ No newline at end of file
+from .system import System
+from .batch import BatchRunner
\ No newline at end of file
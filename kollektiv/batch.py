@@ -0,0 +1,154 @@
+"""
+Runs a batch of goals in one process.
+
+Every goal gets its own storage root below the output directory, with its own
+run journal, so an interrupted batch resumes each goal where it stopped. The
+connections to Ollama, the response cache and the web cache are shared. Several
+goals run at once, keeping the server busy while a single goal is stuck in one
+of its sequential phases:
+
+    python -m kollektiv.batch goals/ --output output --parallel 2 --workers 4
+"""
+
+import argparse
+import contextvars
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from .llm import MetricsRecorder, ResponseCache, WebCache, WebClient, Storage
+from .llm.tokens import TokenCounter
+from .system import System
+
+
+def load_goals(path: str) -> dict[str, str]:
+    """
+    Goals by name, read from a directory (one per .txt or .md file, named after
+    the file) or from a file (one per paragraph, numbered).
+    """
+    goals = {}
+    if os.path.isdir(path):
+        for file_name in sorted(os.listdir(path)):
+            name, extension = os.path.splitext(file_name)
+            if extension not in (".txt", ".md"):
+                continue
+            with open(os.path.join(path, file_name), "r", encoding="utf-8") as file:
+                goal = file.read().strip()
+            if goal:
+                goals[name] = goal
+        return goals
+
+    with open(path, "r", encoding="utf-8") as file:
+        paragraphs = re.split(r"\n\s*\n", file.read())
+    goals = [" ".join(p.split()) for p in paragraphs if p.strip()]
+    return {f"goal_{i + 1:03d}": goal for i, goal in enumerate(goals)}
+
+
+class BatchRunner:
+    """
+    Runs `System` for each goal, `parallel` goals at a time, in
+    `output_directory/<name>`. Further `system_options` (workers, host, ...)
+    are passed on to every System. The request metrics are tagged with the goal;
+    they are traced per goal unless a shared `metrics` recorder is given.
+    """
+
+    def __init__(
+        self,
+        goals: dict[str, str],
+        output_directory: str = "output",
+        parallel: int = 2,
+        cache_directory: Optional[str] = None,
+        offline: bool = False,
+        metrics: Optional[MetricsRecorder] = None,
+        **system_options,
+    ) -> None:
+        assert parallel >= 1, "At least one goal has to run at a time."
+        self.goals = goals
+        self.output_directory = output_directory
+        self.parallel = parallel
+        self.metrics = metrics
+        self.system_options = system_options
+
+        self.cache = None
+        if cache_directory:
+            self.cache = ResponseCache(os.path.join(cache_directory, "responses"))
+            WebClient.cache = WebCache(
+                os.path.join(cache_directory, "web"), offline=offline
+            )
+        elif offline:
+            raise ValueError("Offline mode requires a cache_directory.")
+        if offline:
+            TokenCounter.offline = True
+
+    def directory(self, name: str) -> str:
+        return os.path.join(self.output_directory, name)
+
+    def run_goal(
+        self, name: str, on_progress: Optional[Callable[..., None]] = None
+    ) -> None:
+        with Storage.rooted(self.directory(name)), MetricsRecorder.tagged(goal=name):
+            system = System(
+                goal=self.goals[name],
+                cache=self.cache,
+                metrics=self.metrics,
+                **self.system_options,
+            )
+            system.on_progress = on_progress
+            system.run()
+
+    def run(self) -> dict[str, Exception]:
+        """Runs all goals, returns the errors of those that failed."""
+        print(
+            f"[DEBUG] Running {len(self.goals)} goal(s), {self.parallel} at a time, "
+            f"in '{self.output_directory}'"
+        )
+        failed = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, self.run_goal, name
+                ): name
+                for name in self.goals
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                # a failed goal does not stop the others, a re-run resumes it
+                if future.exception() is not None:
+                    failed[name] = future.exception()
+                    print(f"[WARNING] Goal '{name}' failed: {future.exception()}")
+                else:
+                    print(
+                        f"[DEBUG] Goal '{name}' completed after {time.perf_counter() - start:.0f}s."
+                    )
+        return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a batch of goals.")
+    parser.add_argument("goals", help="directory with one file per goal, or a file")
+    parser.add_argument("--output", default="output")
+    parser.add_argument("--parallel", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cache", default=None)
+    parser.add_argument("--offline", action="store_true")
+    parser.add_argument("--host", action="append", default=None)
+    parser.add_argument("--screening-model", default=None)
+    args = parser.parse_args()
+
+    runner = BatchRunner(
+        load_goals(args.goals),
+        output_directory=args.output,
+        parallel=args.parallel,
+        cache_directory=args.cache,
+        offline=args.offline,
+        workers=args.workers,
+        host=args.host,
+        screening_model=args.screening_model,
+    )
+    failed = runner.run()
+    print(
+        f"{len(runner.goals) - len(failed)} of {len(runner.goals)} goal(s) completed."
+    )
@@ -1,5 +1,11 @@
 from .llm import LLMClient
-from .judge import Judge, EvaluationResult
+from .llm_async import AsyncLLMClient
+from .cache import DiskCache, ResponseCache, WebCache
+from .replay import Cassette, ReplayServer
+from .journal import RunJournal
+from .metrics import MetricsRecorder, CallMetrics
+from .compaction import HistoryCompactor
+from .judge import Judge, JudgeDecision, EvaluationResult
 from .messages import (
     Message,
     UserMessage,
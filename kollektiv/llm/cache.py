@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+class DiskCache:
+    """
+    Persistent key/value store of JSON serializable values, one file per entry.
+
+    Reading an entry refreshes its modification time, which is used to evict the
+    least recently used entries once the total size exceeds `max_bytes`.
+    Entries older than `ttl` seconds (if given) are treated as missing.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(p) for p, _ in self._entries())
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self) -> list[tuple[str, float]]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if file.endswith(".json"):
+                    path = os.path.join(root, file)
+                    entries.append((path, os.path.getmtime(path)))
+        return entries
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted in the meantime, the value is still valid
+        self.hits += 1
+        return entry["value"]
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = json.dumps({"created": time.time(), "value": value})
+
+        # write to a temporary file first, readers never see partial entries
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += os.path.getsize(path) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # shrink a bit below the limit to not evict again on the next write
+        target = int(self.max_bytes * 0.9)
+        for path, _ in sorted(self._entries(), key=lambda e: e[1]):
+            if self._size <= target:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+
+
+# options that only depend on what was sent before, not on the request itself
+IGNORED_OPTIONS = {"num_ctx"}
+
+
+def request_key(request: dict, include_seed: bool) -> str:
+    """
+    Hash of everything that determines the output of a chat request:
+    model name, messages, sampling options and format schema.
+    """
+    options = {
+        k: v
+        for k, v in request.get("options", {}).items()
+        if k not in IGNORED_OPTIONS and (include_seed or k != "seed")
+    }
+    return DiskCache.make_key(
+        request["model"],
+        request["messages"],
+        options,
+        request.get("format"),
+    )
+
+
+class ResponseCache(DiskCache):
+    """
+    Cache of model responses, keyed on `request_key`.
+
+    The seed is only part of the key when it is pinned; with a random seed any
+    previous response is an equally valid sample. The context window size is never
+    part of the key, as it only depends on what other requests were sent before.
+    """
+
+    def key(self, request: dict, include_seed: bool) -> str:
+        return request_key(request, include_seed)
+
+
+# query parameters that only track where a visitor came from (besides utm_*);
+# generic names like `ref` carry content on some sites and are kept
+TRACKING_PARAMETERS = {"fbclid", "gclid", "msclkid"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL: lowercase scheme and host, no default port, no
+    fragment, no tracking parameters and sorted query. The path is kept as given
+    (`/path` and `/path/` may be different pages), only an empty one becomes `/`.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(
+        sorted(
+            (k, v)
+            for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.startswith("utm_") and k not in TRACKING_PARAMETERS
+        )
+    )
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+class WebCache:
+    """
+    Cache of web research, with separate stores for search results, raw HTML
+    and extracted text (so re-extracting never requires re-downloading).
+    Keys are normalized URLs and queries.
+
+    In `offline` mode the WebClient serves only what is cached and never
+    touches the network.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        offline: bool = False,
+    ) -> None:
+        self.offline = offline
+        # stale entries are better than none if there is no way to refresh them
+        ttl = None if offline else ttl
+        # raw HTML is by far the largest, give it half of the budget
+        self.html = DiskCache(os.path.join(directory, "html"), max_bytes // 2, ttl)
+        self.text = DiskCache(os.path.join(directory, "text"), max_bytes // 4, ttl)
+        self.search = DiskCache(os.path.join(directory, "search"), max_bytes // 4, ttl)
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        return DiskCache.make_key(normalize_url(url))
+
+    @staticmethod
+    def search_key(query: str, max_results: int) -> str:
+        return DiskCache.make_key(normalize_query(query), max_results)
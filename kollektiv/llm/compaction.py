@@ -0,0 +1,249 @@
+import asyncio
+import inspect
+import json
+import re
+import threading
+from typing import Optional
+
+from .cache import DiskCache
+from .messages import Message, AssistantMessage, SystemMessage, ToolMessage, UserMessage
+
+RE_READ = re.compile(r"Successfully read file '(.+?)'\.")
+RETRY_MARKER = "did not adhere to the requested format"
+RESULT_SEPARATOR = "\n\n---\n\n"
+
+SUMMARY_PROMPT = """
+You are reflecting on the earlier part of your current work session.
+These are the messages exchanged so far:
+<messages>
+{messages}
+</messages>
+
+Summarize them for your future self, who will continue the work without seeing them.
+Focus on decisions made, facts learned, files read or written (by name) and open issues.
+Do not repeat file contents, they can be read again with the tools.
+Keep your sentences short and concise.
+"""
+
+
+def _tool_calls(content: str) -> Optional[list]:
+    if not content.startswith("INVOKE_TOOL"):
+        return None
+    payload = content[len("INVOKE_TOOL") :].strip()
+    if payload.startswith("```json") and payload.endswith("```"):
+        payload = payload[len("```json") : -len("```")]
+    try:
+        calls = json.loads(payload)
+    except json.JSONDecodeError:
+        return None
+    calls = [calls] if isinstance(calls, dict) else calls
+    return calls if isinstance(calls, list) else None
+
+
+def _written_files(calls: list) -> list[str]:
+    return [
+        c.get("arguments", {}).get("file_name")
+        for c in calls
+        if isinstance(c, dict) and c.get("name") == "write_file"
+    ]
+
+
+class HistoryCompactor:
+    """
+    Keeps the history of a long running conversation within `budget` tokens.
+
+    The first `head` messages (priming, goal, input files) are never touched.
+    Once the history exceeds the budget, the rest is compacted in steps until
+    it fits:
+
+    1. file contents that were read or written again later are omitted,
+       repeated requests are shortened,
+    2. responses rejected for not adhering to the requested format are collapsed
+       into a note,
+    3. everything but the `keep_recent` latest messages is summarized by the model.
+
+    The history is only rewritten when over budget, as every rewrite invalidates
+    the server's prompt cache from the first changed message on. Summaries are
+    memoized, so compacting the same messages again yields the same prefix.
+    """
+
+    def __init__(
+        self, llm, head: int, budget: int = 16000, keep_recent: int = 6
+    ) -> None:
+        self.llm = llm
+        self.head = head
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self._summaries: dict[str, SystemMessage] = {}
+        self._lock = threading.Lock()
+
+    def _tokens(self, messages: list[Message]) -> int:
+        return self.llm.token_counter.count_messages(messages)
+
+    def compact(self, messages: list[Message]) -> list[Message]:
+        if self._tokens(messages) <= self.budget:
+            return messages
+
+        head, body = messages[: self.head], messages[self.head :]
+        body = self._collapse_retries(self._drop_superseded(body))
+        shortened = self._shorten_repeats(body)
+        if self._tokens(head + shortened) > self.budget:
+            # summarize first, a repetition must not point to a summarized request
+            shortened = self._shorten_repeats(self._summarize(body))
+        return self._report(messages, head + shortened)
+
+    async def compact_async(self, messages: list[Message]) -> list[Message]:
+        """`compact` for async clients, the summary is awaited instead of blocking the event loop."""
+        if not inspect.iscoroutinefunction(self.llm.chat):
+            return await asyncio.to_thread(self.compact, messages)
+        if self._tokens(messages) <= self.budget:
+            return messages
+
+        head, body = messages[: self.head], messages[self.head :]
+        body = self._collapse_retries(self._drop_superseded(body))
+        shortened = self._shorten_repeats(body)
+        if self._tokens(head + shortened) > self.budget:
+            shortened = self._shorten_repeats(await self._summarize_async(body))
+        return self._report(messages, head + shortened)
+
+    def _report(
+        self, messages: list[Message], compacted: list[Message]
+    ) -> list[Message]:
+        print(
+            f"[DEBUG] History compacted: {len(messages)} -> {len(compacted)} messages, "
+            f"{self._tokens(messages)} -> {self._tokens(compacted)} tokens (budget: {self.budget})"
+        )
+        return compacted
+
+    @staticmethod
+    def _drop_superseded(body: list[Message]) -> list[Message]:
+        # files read or written later on, walking backwards
+        later: set[str] = set()
+        compacted = []
+        for message in reversed(body):
+            if isinstance(message, ToolMessage):
+                parts = message.content.split(RESULT_SEPARATOR)
+                for i, part in enumerate(parts):
+                    read = RE_READ.search(part)
+                    if read and read.group(1) in later:
+                        parts[i] = (
+                            f"Successfully read file '{read.group(1)}'. "
+                            "[content omitted, the file was read or written again later]"
+                        )
+                    elif read:
+                        later.add(read.group(1))
+                if RESULT_SEPARATOR.join(parts) != message.content:
+                    message = ToolMessage(RESULT_SEPARATOR.join(parts))
+            elif isinstance(message, AssistantMessage):
+                calls = _tool_calls(message.content)
+                if calls and any(f in later for f in _written_files(calls)):
+                    for call in calls:
+                        file_name = call.get("arguments", {}).get("file_name")
+                        if call.get("name") == "write_file" and file_name in later:
+                            omitted = (
+                                "[omitted, the file was read or written again later]"
+                            )
+                            call["arguments"]["content"] = omitted
+                    message = AssistantMessage(f"INVOKE_TOOL{json.dumps(calls)}")
+                if calls:
+                    later.update(f for f in _written_files(calls) if f)
+            compacted.append(message)
+        compacted.reverse()
+        return compacted
+
+    @staticmethod
+    def _shorten_repeats(body: list[Message]) -> list[Message]:
+        # the earliest occurrence of a request stays, repetitions point back to it
+        compacted = []
+        seen: set[str] = set()
+        for message in body:
+            if isinstance(message, UserMessage):
+                if message.content in seen:
+                    message = UserMessage("(Same request as above.)")
+                seen.add(message.content)
+            compacted.append(message)
+        return compacted
+
+    @staticmethod
+    def _collapse_retries(body: list[Message]) -> list[Message]:
+        last_assistant = max(
+            (i for i, m in enumerate(body) if isinstance(m, AssistantMessage)),
+            default=-1,
+        )
+        compacted = []
+        rejected = 0
+        i = 0
+        while i < len(body):
+            message = body[i]
+            following = body[i + 1] if i + 1 < len(body) else None
+            if (
+                isinstance(message, AssistantMessage)
+                and i < last_assistant
+                and isinstance(following, ToolMessage)
+                and RETRY_MARKER in following.content
+            ):
+                rejected += 1
+                i += 2
+                continue
+            if rejected:
+                compacted.append(
+                    SystemMessage(
+                        f"[{rejected} earlier response(s) omitted, they did not adhere to the requested format.]"
+                    )
+                )
+                rejected = 0
+            compacted.append(message)
+            i += 1
+        return compacted
+
+    def _split(self, body: list[Message]) -> int:
+        split = max(len(body) - self.keep_recent, 0)
+        # a tool result must stay with the call that produced it
+        while 0 < split < len(body) and isinstance(body[split], ToolMessage):
+            split -= 1
+        return split
+
+    def _memoized(self, older: list[Message]) -> tuple[str, Optional[SystemMessage]]:
+        key = DiskCache.make_key([m.to_dict() for m in older])
+        with self._lock:
+            return key, self._summaries.get(key)
+
+    def _memoize(self, key: str, content: str) -> SystemMessage:
+        summary = SystemMessage(f"Summary of the earlier conversation:\n{content}")
+        with self._lock:
+            self._summaries[key] = summary
+        return summary
+
+    @staticmethod
+    def _summary_prompt(older: list[Message]) -> str:
+        return SUMMARY_PROMPT.format(
+            messages="\n".join(m._get_printable() for m in older)
+        )
+
+    def _summarize(self, body: list[Message]) -> list[Message]:
+        split = self._split(body)
+        if split == 0:
+            return body
+
+        older, recent = body[:split], body[split:]
+        key, summary = self._memoized(older)
+        if summary is None:
+            content, _ = self.llm.chat(
+                message=self._summary_prompt(older), verbose=False
+            )
+            summary = self._memoize(key, content)
+        return [summary] + recent
+
+    async def _summarize_async(self, body: list[Message]) -> list[Message]:
+        split = self._split(body)
+        if split == 0:
+            return body
+
+        older, recent = body[:split], body[split:]
+        key, summary = self._memoized(older)
+        if summary is None:
+            content, _ = await self.llm.chat(
+                message=self._summary_prompt(older), verbose=False
+            )
+            summary = self._memoize(key, content)
+        return [summary] + recent
@@ -0,0 +1,110 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ContextResize:
+    timestamp: float
+    old_size: Optional[int]
+    new_size: int
+    required: int
+    load_seconds: Optional[float] = None
+
+
+class ContextWindowPolicy:
+    """
+    Chooses the `num_ctx` sent to Ollama.
+
+    Ollama reloads the model (or at least reallocates its KV cache) every time
+    `num_ctx` changes. Instead of sending the exact size needed, the requirement
+    is rounded up to a power-of-two bucket and the allocation is kept as long as
+    the requests fit. It only ever grows, so the number of reloads per model is
+    bounded by the number of buckets.
+
+    Policies are shared per model name, as all clients of a model (e.g. the
+    worker and the judge) hit the same runner on the server.
+    """
+
+    _policies: dict[str, "ContextWindowPolicy"] = {}
+    _policies_lock = threading.Lock()
+
+    # a load taking longer than this is reported as a reload
+    RELOAD_THRESHOLD_SECONDS = 0.5
+
+    def __init__(
+        self, model_name: str, min_size: int = 2048, max_size: int = 32768
+    ) -> None:
+        assert (
+            min_size > 0 and min_size & (min_size - 1) == 0
+        ), "min_size must be a power of two."
+        assert max_size >= min_size, "max_size must not be smaller than min_size."
+        self.model_name = model_name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.current: Optional[int] = None
+        self.resizes: list[ContextResize] = []
+        self.reloads = 0
+        self.reload_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def for_model(model_name: str) -> "ContextWindowPolicy":
+        with ContextWindowPolicy._policies_lock:
+            policies = ContextWindowPolicy._policies
+            if model_name not in policies:
+                policies[model_name] = ContextWindowPolicy(model_name)
+            return policies[model_name]
+
+    def bucket(self, required: int) -> int:
+        size = self.min_size
+        while size < required and size < self.max_size:
+            size *= 2
+        return min(size, self.max_size)
+
+    def resolve(self, required: int) -> int:
+        with self._lock:
+            if self.current is not None and required <= self.current:
+                return self.current
+
+            new_size = self.bucket(required)
+            if required > new_size:
+                print(
+                    f"[WARNING] Required context of {required} exceeds the largest bucket "
+                    f"of '{self.model_name}' ({self.max_size}), the input will be truncated."
+                )
+            if new_size == self.current:
+                return self.current
+
+            print(
+                f"[DEBUG] Context window of '{self.model_name}' resized: "
+                f"{self.current} -> {new_size} (required: {required})"
+            )
+            self.resizes.append(
+                ContextResize(time.time(), self.current, new_size, required)
+            )
+            self.current = new_size
+            return new_size
+
+    def record_load(self, num_ctx: int, load_duration: Optional[int]) -> None:
+        """Records the `load_duration` (ns) Ollama reported for a request sent with `num_ctx`."""
+        if not load_duration:
+            return
+
+        seconds = load_duration / 1e9
+        if seconds < self.RELOAD_THRESHOLD_SECONDS:
+            return
+
+        with self._lock:
+            self.reloads += 1
+            self.reload_seconds += seconds
+            for resize in reversed(self.resizes):
+                if resize.new_size == num_ctx and resize.load_seconds is None:
+                    resize.load_seconds = seconds
+                    break
+
+        print(
+            f"[DEBUG] Model '{self.model_name}' (re)loaded with num_ctx={num_ctx} in {seconds:.2f}s "
+            f"(total: {self.reloads} loads, {self.reload_seconds:.2f}s)"
+        )
@@ -1,3 +1,3 @@
 from .handle import Handler
-from .tools_handler import ToolHandler
+from .tools_handler import ToolHandler, local
 from .format_handler import FormatHandler
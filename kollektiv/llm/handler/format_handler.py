@@ -1,16 +1,32 @@
 from .handle import Handler
+from .stream import FencedJsonValidator
 from pydantic import BaseModel
 from typing import Any
+import json
 
 
 class FormatHandler(Handler):
 
-    def __init__(self, format: BaseModel, retry_attempts: int = 3):
+    def __init__(self, format: BaseModel, retry_attempts: int = 3, native: bool = False):
+        """
+        With `native`, the schema is passed to Ollama as `format` and decoding is
+        constrained to it, so the response is plain JSON and the prompt only needs
+        to name the expected structure.
+        """
         assert issubclass(format, BaseModel), "Format must be a subclass of BaseModel."
         self.format = format
+        self.native = native
+        if native:
+            self.response_format = format.model_json_schema()
         super().__init__(retry_attempts)
 
     def _prepare_instructions(self) -> str:
+        if self.native:
+            return (
+                "Respond with a JSON object conforming to this schema:\n"
+                f"{json.dumps(self.response_format, separators=(',', ':'))}"
+            )
+
         return (
             "Your final response must be formatted as JSON that conforms to this schema:\n\n"
             f"```json\n{self.format.model_json_schema()}\n```\n\n"
@@ -23,9 +39,19 @@ class FormatHandler(Handler):
             "is a well-formatted instance of the schema."
         )
     
+    def stream_validator(self) -> FencedJsonValidator:
+        return FencedJsonValidator(
+            schema=self.format.model_json_schema(),
+            fence=None if self.native else True,
+        )
+
     def consider(self, response: str) -> bool:
+        if self.native and response.startswith("{"):
+            return True
         return response.startswith("```json") and response.endswith("```")
     
     def _invoke(self, response: str) -> Any:
-        response = response[7:-3].strip()
+        if response.startswith("```json") and response.endswith("```"):
+            response = response[7:-3]
+        response = response.strip()
         return self.format.model_validate_json(response, strict=True)
@@ -1,10 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Optional
 
 from ..messages import ToolMessage
 
 
 class Handler(ABC):
+    # JSON schema the model output is constrained to (Ollama `format`), if any
+    response_format: Optional[dict] = None
+
     def __init__(self, retry_attempts: int = 3):
         self.retry_attempts = retry_attempts
         self.attempt = 0
@@ -25,6 +28,13 @@ class Handler(ABC):
         """Perform a single attempt to resolve the response."""
         pass
 
+    def stream_validator(self) -> Optional[Any]:
+        """
+        Fresh validator whose `feed(chunk)` returns False once a streamed response
+        can no longer be handled, None if any response might be.
+        """
+        return None
+
     def invoke(self, response: str) -> tuple[bool, Any]:
         """Handle retry logic and delegate resolution to `_resolve_once`."""
         try:
@@ -0,0 +1,274 @@
+import re
+from typing import Optional
+
+LITERALS = ("true", "false", "null")
+LITERAL_CHARS = set("0123456789+-.eEtruefalsn")
+NUMBER_PREFIX = re.compile(r"^-?(0|[1-9]\d*)?(\.\d*)?([eE][+-]?\d*)?$")
+NUMBER = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$")
+
+FIRST_CHARS = {
+    "object": "{",
+    "array": "[",
+    "string": '"',
+    "boolean": "tf",
+    "integer": "-0123456789",
+    "number": "-0123456789",
+    "null": "n",
+}
+
+
+def _first_chars(schema: dict) -> Optional[str]:
+    """Characters a JSON value matching `schema` can start with, None if unknown."""
+    if "$ref" in schema:
+        return "{"
+    if "type" in schema:
+        types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        if not all(t in FIRST_CHARS for t in types):
+            return None
+        return "".join(FIRST_CHARS[t] for t in types)
+    for combinator in ("anyOf", "oneOf"):
+        if combinator in schema:
+            options = [_first_chars(s) for s in schema[combinator]]
+            return None if None in options else "".join(options)
+    return None
+
+
+class JsonStreamValidator:
+    """
+    Incremental recognizer for a single JSON value.
+
+    `feed` returns False as soon as the text seen so far can no longer be the
+    beginning of valid JSON. If a schema is given, the keys of the top-level
+    object and the type of their values are checked as well.
+    """
+
+    def __init__(self, schema: Optional[dict] = None) -> None:
+        self.properties = (schema or {}).get("properties")
+        self.closed = (schema or {}).get("additionalProperties") is False
+        self.stack: list[str] = []
+        self.state = "value"
+        self.done = False
+        self.in_string = False
+        self.in_key = False
+        self.escape = False
+        self.key: Optional[str] = None
+        self.literal = ""
+        self.expect: Optional[str] = None
+
+    def feed(self, text: str) -> bool:
+        return all(self._feed_char(ch) for ch in text)
+
+    def _feed_char(self, ch: str) -> bool:
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                if self.in_key:
+                    self.in_key = False
+                    self.state = "colon"
+                    return self._check_key()
+                self._end_value()
+                return True
+            if self.key is not None:
+                self.key += ch
+            return True
+
+        if self.literal:
+            if ch in LITERAL_CHARS:
+                self.literal += ch
+                return self._literal_prefix_ok()
+            if not (self.literal in LITERALS or NUMBER.match(self.literal)):
+                return False
+            self.literal = ""
+            self._end_value()
+
+        if ch.isspace():
+            return True
+        if self.done:
+            return False
+
+        if self.state == "value":
+            return self._start_value(ch)
+        if self.state == "value_or_end":
+            if ch == "]":
+                self.stack.pop()
+                self._end_value()
+                return True
+            return self._start_value(ch)
+        if self.state in ("key_or_end", "key"):
+            if ch == "}" and self.state == "key_or_end":
+                self.stack.pop()
+                self._end_value()
+                return True
+            if ch != '"':
+                return False
+            self.in_string = True
+            self.in_key = True
+            # only the keys of the top-level object are checked against the schema
+            self.key = "" if len(self.stack) == 1 else None
+            return True
+        if self.state == "colon":
+            if ch != ":":
+                return False
+            self.state = "value"
+            return True
+        if self.state == "comma_or_end":
+            container = self.stack[-1]
+            if ch == ",":
+                self.state = "key" if container == "o" else "value"
+                return True
+            if ch == ("}" if container == "o" else "]"):
+                self.stack.pop()
+                self._end_value()
+                return True
+            return False
+        return False
+
+    def _start_value(self, ch: str) -> bool:
+        if self.expect is not None:
+            if ch not in self.expect:
+                return False
+            self.expect = None
+
+        if ch == "{":
+            self.stack.append("o")
+            self.state = "key_or_end"
+        elif ch == "[":
+            self.stack.append("a")
+            self.state = "value_or_end"
+        elif ch == '"':
+            self.in_string = True
+        elif ch in "-0123456789tfn":
+            self.literal = ch
+            return self._literal_prefix_ok()
+        else:
+            return False
+        return True
+
+    def _end_value(self) -> None:
+        if self.stack:
+            self.state = "comma_or_end"
+        else:
+            self.done = True
+
+    def _literal_prefix_ok(self) -> bool:
+        if any(lit.startswith(self.literal) for lit in LITERALS):
+            return True
+        return NUMBER_PREFIX.match(self.literal) is not None
+
+    def _check_key(self) -> bool:
+        key, self.key = self.key, None
+        if key is None or self.properties is None:
+            return True
+        if key not in self.properties:
+            return not self.closed
+        self.expect = _first_chars(self.properties[key])
+        return True
+
+
+class FencedJsonValidator:
+    """
+    Incremental check of responses shaped `<prefix>` + JSON, where the JSON is
+    wrapped in a ```json fence if `fence` is True, may be if None and must not
+    be if False.
+    """
+
+    FENCE_OPEN = "```json"
+    FENCE_CLOSE = "```"
+
+    def __init__(
+        self,
+        prefix: str = "",
+        schema: Optional[dict] = None,
+        fence: Optional[bool] = True,
+    ) -> None:
+        self.prefix = prefix
+        self.fence = fence
+        self.json = JsonStreamValidator(schema)
+        self.phase = "prefix" if prefix else "open"
+        self.buffer = ""
+        self.fenced = False
+
+    def feed(self, text: str) -> bool:
+        return all(self._feed_char(ch) for ch in text)
+
+    def _feed_char(self, ch: str) -> bool:
+        if self.phase == "prefix":
+            self.buffer += ch
+            if not self.prefix.startswith(self.buffer):
+                return False
+            if self.buffer == self.prefix:
+                self.phase, self.buffer = "open", ""
+            return True
+
+        if self.phase == "open":
+            if not self.buffer and ch.isspace():
+                # whitespace is only tolerated in between a prefix and the JSON
+                return bool(self.prefix)
+            if self.fence is not False and self.FENCE_OPEN.startswith(self.buffer + ch):
+                self.buffer += ch
+                if self.buffer == self.FENCE_OPEN:
+                    self.phase, self.buffer, self.fenced = "json", "", True
+                return True
+            if self.buffer or self.fence is True:
+                return False
+            self.phase = "json"
+
+        if self.phase == "json":
+            if self.json.done:
+                self.phase = "close" if self.fenced else "tail"
+            else:
+                return self.json.feed(ch)
+
+        if self.phase == "close":
+            if not self.buffer and ch.isspace():
+                return True
+            self.buffer += ch
+            if not self.FENCE_CLOSE.startswith(self.buffer):
+                return False
+            if self.buffer == self.FENCE_CLOSE:
+                self.phase = "tail"
+            return True
+
+        return ch.isspace()
+
+
+class StreamMonitor:
+    """
+    Feeds a streamed response to the validators of all handlers that could
+    consume it, skipping a leading <think> block like `_clean_thinking` does.
+    `feed` returns False once no handler can accept the response anymore.
+    """
+
+    def __init__(self, validators: list) -> None:
+        self.validators = validators
+        self.head = ""
+        self.thinking: Optional[bool] = None
+        self.strip = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.thinking is not False:
+            self.head += chunk
+            if self.thinking is None:
+                if "<think>".startswith(self.head):
+                    return True
+                self.thinking = self.strip = self.head.startswith("<think>")
+            if self.thinking:
+                if "</think>" not in self.head:
+                    return True
+                chunk = self.head.split("</think>")[-1]
+            else:
+                chunk = self.head
+            self.thinking = False
+
+        if self.strip:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return True
+            self.strip = False
+
+        self.validators = [v for v in self.validators if v.feed(chunk)]
+        return bool(self.validators)
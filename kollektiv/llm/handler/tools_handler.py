@@ -1,6 +1,11 @@
 from .handle import Handler
+from .stream import FencedJsonValidator
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 from langchain_core.tools import tool
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
+import json
+from ..cache import DiskCache
 from ..messages import ToolMessage
 
 
@@ -9,11 +14,33 @@ class ToolCall(BaseModel):
     arguments: dict = Field(description="The arguments to pass to the tool.")
 
 
+ToolCalls = TypeAdapter(list[ToolCall])
+
+
+def local(tool: callable) -> callable:
+    """
+    Marks a tool that only works on local files. Its calls are cheap and not
+    journaled, they are executed again when a run is replayed: files written
+    have to be restored, and files read may have changed in the meantime.
+    """
+    tool.local = True
+    return tool
+
+
 class ToolHandler(Handler):
 
-    def __init__(self, tools: list[callable], retry_attempts: int = 3):
+    def __init__(
+        self,
+        tools: list[callable],
+        retry_attempts: int = 3,
+        max_workers: int = 4,
+        journal=None,
+    ):
         self.tools = tools
         self.tool_mapping = {t.__name__: t for t in tools}
+        self.max_workers = max_workers
+        # RunJournal the tool results are recorded in and replayed from
+        self.journal = journal
         super().__init__(retry_attempts)
 
     def _prepare_instructions(self) -> str:
@@ -29,35 +56,72 @@ class ToolHandler(Handler):
 
         instructions += (
             "** Instructions on how to use the tool(s) **\n"
-            "IF you want to invoke the tool, you MUST respond with the `INVOKE_TOOL` prefix followed by this schema:\n"
-            f"```json\n{ToolCall.model_json_schema()}\n```\n"
+            "IF you want to invoke the tool, you MUST respond with the `INVOKE_TOOL` prefix followed by a list of calls with this schema:\n"
+            f"```json\n{ToolCalls.json_schema()}\n```\n"
             "\n"
             "For example:\n"
             "INVOKE_TOOL```json\n"
-            '{"name": "foo", "arguments": {"query": "bar"}}\n'
+            '[{"name": "foo", "arguments": {"query": "bar"}}]\n'
             "```"
             "\n"
-            "Note: You can only use one tool at a time!\n"
-            "You will receive the result in the next response."
+            "Note: If you need several independent tool calls (e.g. reading multiple files), "
+            "put all of them in the list instead of invoking them one after another. "
+            "They are executed concurrently.\n"
+            "You will receive all results in the next response."
         )
         return instructions
 
+    def stream_validator(self) -> FencedJsonValidator:
+        return FencedJsonValidator(
+            prefix="INVOKE_TOOL", schema=ToolCall.model_json_schema(), fence=None
+        )
+
     def consider(self, response: str) -> bool:
         return response.startswith("INVOKE_TOOL")
 
+    def _call(self, tool: callable, call: ToolCall) -> ToolMessage:
+        if not self.journal or getattr(tool, "local", False):
+            return tool(**call.arguments)
+
+        key = DiskCache.make_key(call.name, call.arguments)
+        journaled = self.journal.replay("tool", key)
+        if journaled is not None:
+            return ToolMessage(journaled["content"])
+        result = tool(**call.arguments)
+        self.journal.record("tool", key, name=call.name, content=result.content)
+        return result
+
     def _invoke(self, response: str) -> ToolMessage:
         response = response[11:].strip()
 
         if response.startswith("```json") and response.endswith("```"):
             response = response[7:-3].strip()
 
-        response = ToolCall.model_validate_json(response)
+        # a single call object is accepted as well
+        if isinstance(json.loads(response), dict):
+            response = f"[{response}]"
+        calls = ToolCalls.validate_json(response)
+        if not calls:
+            raise ValueError("The list of tool calls is empty.")
 
-        tool_name = response.name
-        tool_args = response.arguments
-        tool = self.tool_mapping[tool_name]
-        result = tool(**tool_args)
+        # resolve all tools first, an unknown one must not leave the others half executed
+        tools = [self.tool_mapping[call.name] for call in calls]
+        if len(calls) == 1:
+            results = [self._call(tools[0], calls[0])]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(len(calls), self.max_workers)
+            ) as executor:
+                # each call in a copy of the caller's context (e.g. storage root)
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._call, t, call)
+                    for t, call in zip(tools, calls)
+                ]
+                results = [f.result() for f in futures]
 
         return ToolMessage(
-            f"Tool '{tool_name}' executed successfully.\n\n{result.content}"
+            "\n\n---\n\n".join(
+                f"Tool '{call.name}' executed successfully.\n\n{result.content}"
+                for call, result in zip(calls, results)
+            )
         )
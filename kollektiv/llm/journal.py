@@ -0,0 +1,147 @@
+import collections
+import contextlib
+import contextvars
+import json
+import os
+import threading
+from typing import Iterator, Optional
+
+# step the entries recorded in the current thread or task belong to, see `RunJournal.step`
+_step: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "step", default=None
+)
+
+
+class RunJournal:
+    """
+    Append-only JSONL journal of everything a run paid for: model responses,
+    tool results, judge evaluations and completed steps (with the hashes of the
+    files they produced). Every entry is fsynced before the run moves on.
+
+    When a run is resumed, the entries of the previous runs are replayed: a
+    request, tool call or evaluation identical to a journaled one gets the
+    journaled result (in recorded order) instead of being executed again. As
+    the prompts are rebuilt from the replayed results, the run retraces its
+    steps for free and continues live where it was interrupted.
+
+    Entries are tagged with the step they were recorded in (see `step`). A
+    completed step whose output files are gone counts as not completed, and its
+    entries are no longer replayed, so that the step is generated anew.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.replayed = 0
+        self._pending: dict[tuple[str, str], collections.deque] = (
+            collections.defaultdict(collections.deque)
+        )
+        self._steps: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        entries = self._load()
+        for entry in entries:
+            if entry["kind"] == "step":
+                self._steps[entry["key"]] = entry
+            else:
+                self._pending[(entry["kind"], entry["key"])].append(entry)
+        # whether a previous run left entries behind
+        self.resumed = bool(entries)
+        if self.resumed:
+            print(
+                f"[DEBUG] Resuming from run journal '{path}' "
+                f"({len(entries)} entries, {len(self._steps)} completed steps)."
+            )
+
+    def _load(self) -> list[dict]:
+        if not os.path.exists(self.path):
+            return []
+
+        entries, valid = [], 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                # a crash may leave the last entry torn
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                valid += len(line)
+
+        if valid < os.path.getsize(self.path):
+            print(
+                f"[WARNING] Dropping a torn entry at the end of the run journal '{self.path}'."
+            )
+            with open(self.path, "r+b") as file:
+                file.truncate(valid)
+        return entries
+
+    @staticmethod
+    @contextlib.contextmanager
+    def step(step: str) -> Iterator[None]:
+        """Tags the entries recorded within the block (in the current thread or task) with `step`."""
+        token = _step.set(step)
+        try:
+            yield
+        finally:
+            _step.reset(token)
+
+    def record(self, kind: str, key: str, **data) -> None:
+        if kind != "step" and _step.get() is not None:
+            data = {"step": _step.get(), **data}
+        line = json.dumps({"kind": kind, "key": key, **data}, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+
+    def replay(self, kind: str, key: str) -> Optional[dict]:
+        """The next journaled entry for `key` not replayed yet, None if there is none."""
+        with self._lock:
+            pending = self._pending.get((kind, key))
+            if not pending:
+                return None
+            self.replayed += 1
+            return pending.popleft()
+
+    def complete(
+        self,
+        step: str,
+        files: dict[str, str],
+        inputs: Optional[dict[str, Optional[str]]] = None,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        """
+        Records that `step` is done, with the hashes of the files it produced and
+        of the input files it used, and the fingerprint of its prompt.
+        """
+        entry = dict(files=files, inputs=inputs or {}, fingerprint=fingerprint)
+        self.record("step", step, **entry)
+        with self._lock:
+            self._steps[step] = entry
+
+    def completed(self, step: str) -> Optional[dict]:
+        """
+        Latest record of `step` (see `complete`), None if it was never completed
+        or its output files no longer exist.
+        """
+        with self._lock:
+            entry = self._steps.get(step)
+            if entry is None:
+                return None
+            directory = os.path.dirname(self.path)
+            if all(os.path.exists(os.path.join(directory, f)) for f in entry["files"]):
+                return entry
+
+            # its entries would write the same files back
+            del self._steps[step]
+            for key, pending in list(self._pending.items()):
+                kept = [e for e in pending if e.get("step") != step]
+                if len(kept) < len(pending):
+                    self._pending[key] = collections.deque(kept)
+        print(
+            f"[DEBUG] Output of step '{step}' is missing, it is not replayed from the run journal."
+        )
+        return None
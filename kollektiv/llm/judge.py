@@ -1,6 +1,11 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
+from .cache import DiskCache
 from .messages import SystemMessage
 
 
@@ -65,7 +70,7 @@ class EvaluationResult(BaseModel):
     )
 
 
-PROMPT = """
+PROMPT_HEADER = """
 You are an expert AI Evaluation Judge, acting as a stern and meticulous critic. Your task is to rigorously evaluate an AI-generated answer based on a given goal or task description. Your critique should be harsh but fair, identifying every possible area for improvement.
 You MUST provide your evaluation in a structured JSON format according to the schema provided.
 
@@ -83,9 +88,12 @@ SCORING SCALE FOR ALL CRITERIA:
 4: Good - Performs well with only minor, non-significant issues
 5: Excellent - Meets criterion perfectly or almost perfectly with no significant issues
 
-EVALUATION CRITERIA:
+"""
 
-1. FACTUAL ACCURACY
+# one section per criterion of EvaluationResult
+CRITERIA = {
+    "criterion_factual_accuracy": """
+FACTUAL ACCURACY
    Focus: Truthfulness and verifiability of information; absence of fabrications or misleading statements
    Scoring Guide:
    1: Mostly inaccurate with significant misleading information
@@ -93,8 +101,9 @@ EVALUATION CRITERIA:
    3: Generally accurate with some noticeable errors or minor inaccuracies
    4: Mostly accurate with only very minor, non-misleading inaccuracies
    5: Completely factually accurate and verifiable
-
-2. RELEVANCE
+""",
+    "criterion_relevance": """
+RELEVANCE
    Focus: Direct alignment with the stated goal/task; absence of unnecessary information
    Scoring Guide:
    1: Completely irrelevant or fundamentally misinterprets the goal
@@ -102,8 +111,9 @@ EVALUATION CRITERIA:
    3: Moderately relevant but includes off-topic information or misses aspects of the goal
    4: Mostly relevant with minimal irrelevant content
    5: Perfectly aligned with all aspects of the goal
-
-3. COMPLETENESS
+""",
+    "criterion_completeness": """
+COMPLETENESS
    Focus: Comprehensive coverage of all aspects of the goal/task with sufficient detail
    Scoring Guide:
    1: Grossly incomplete, missing critical aspects or extremely superficial
@@ -111,8 +121,9 @@ EVALUATION CRITERIA:
    3: Partially complete, addressing main points but missing some details or nuances
    4: Mostly complete with only minor omissions
    5: Fully comprehensive, addressing all aspects with appropriate depth
-
-4. CLARITY & COHERENCE
+""",
+    "criterion_clarity_coherence": """
+CLARITY & COHERENCE
    Focus: Logical structure, clear language, smooth flow, and grammatical correctness
    Scoring Guide:
    1: Very unclear, illogical, or incoherent with severe grammatical issues
@@ -120,8 +131,9 @@ EVALUATION CRITERIA:
    3: Reasonably clear but with some awkward phrasing or minor structural issues
    4: Clear, coherent, and well-structured with minimal grammatical errors
    5: Exceptionally clear, precise, and perfectly structured
-
-5. INSTRUCTION FOLLOWING
+""",
+    "criterion_instruction_following": """
+INSTRUCTION FOLLOWING
    Focus: Adherence to all explicit and implicit instructions in the goal/task
    Scoring Guide:
    1: Completely ignores or fundamentally misunderstands instructions
@@ -129,7 +141,10 @@ EVALUATION CRITERIA:
    3: Follows some instructions but misses or imperfectly implements others
    4: Follows most instructions with only minor deviations
    5: Perfectly follows all explicit and reasonably implicit instructions
+""",
+}
 
+PROMPT_FOOTER = """
 ---
 
 This is the full interaction of the user with the AI including the goal/task and the AI-generated answer:
@@ -139,13 +154,63 @@ This is the full interaction of the user with the AI including the goal/task and
 """
 
 
+def _title(criterion: str) -> str:
+    return CRITERIA[criterion].split("\n")[1].title()
+
+
+PROMPT = (
+    PROMPT_HEADER
+    + "EVALUATION CRITERIA:\n\n"
+    + "\n".join(f"{i}. {c.strip()}\n" for i, c in enumerate(CRITERIA.values(), 1))
+    + PROMPT_FOOTER
+)
+
+
+@dataclass
+class JudgeDecision:
+    # "screening" or "full" in a cascade, "single" for a judge without a screen
+    tier: str
+    model_name: str
+    score: float
+    escalation_reason: Optional[str] = None
+
+
 class Judge:
-    def __init__(self, llm) -> None:
+    """
+    Evaluates answers with the given LLMClient.
+
+    With `per_criterion`, every criterion is evaluated by its own request and
+    the requests run concurrently. The summary is then aggregated locally, with
+    `overall_score` being the mean of the criterion scores. A failing criterion
+    is retried on its own instead of regenerating the whole evaluation.
+
+    With a `screen` judge (backed by a smaller model), every answer is screened
+    first and this judge only runs if the screening is inconclusive: the overall
+    score falls into `escalate_range` (lower bound inclusive, upper exclusive),
+    the criterion scores disagree by more than `max_spread` or the screening
+    failed. Every decision is recorded in `decisions`, every result in the run
+    journal of the client (if it has one), along with the tier and model that
+    decided it.
+    """
+
+    def __init__(
+        self,
+        llm,
+        per_criterion: bool = False,
+        screen: Optional["Judge"] = None,
+        escalate_range: tuple[float, float] = (3.0, 4.5),
+        max_spread: int = 2,
+    ) -> None:
         self.llm = llm
         self.llm.context_window_dynamic = True
+        self.per_criterion = per_criterion
+        self.screen = screen
+        self.escalate_range = escalate_range
+        self.max_spread = max_spread
+        self.decisions: list[JudgeDecision] = []
 
-    def evaluate(self, history:str) -> EvaluationResult:
-        evalResult, _ = self.llm.chat(
+    def _prepare_chat(self, history: str) -> dict:
+        return dict(
             message=(
                 "Start by summarizing what the user actually asked for and what ressources were made available to the AI. "
                 "Then providing a detailed evaluation for each criterion, including arguments for and against the score. "
@@ -157,4 +222,241 @@ class Judge:
             ],
             format=EvaluationResult,
         )
-        return evalResult
+
+    def _prepare_criterion_chat(self, history: str, criterion: str) -> dict:
+        # the system prompt (with the long history) is the same for all criteria,
+        # so that the concurrent requests share its prefix in the prompt cache
+        return dict(
+            message=(
+                "Evaluate the answer on this criterion only:\n"
+                + CRITERIA[criterion]
+                + "\nStart by summarizing what the user actually asked for and what ressources were made available to the AI. "
+                "Then provide a detailed evaluation for the criterion, including arguments for and against the score. "
+                "Finally, respond with the evaluation in the requested format."
+            ),
+            history=[SystemMessage(PROMPT.format(history=history))],
+            format=CriterionEvaluation,
+            verbose=False,  # concurrent streams would interleave
+        )
+
+    @staticmethod
+    def _aggregate(criteria: dict[str, CriterionEvaluation]) -> EvaluationResult:
+        ranked = sorted(criteria.items(), key=lambda c: c[1].score)
+
+        overall_score = round(
+            sum(c.score for c in criteria.values()) / len(criteria), 2
+        )
+        summary = EvaluationSummary(
+            key_strengths=[
+                f"{_title(k)}: {c.arguments_for[0]}"
+                for k, c in reversed(ranked)
+                if c.arguments_for
+            ][:3],
+            key_weaknesses=[
+                f"{_title(k)}: {c.arguments_against[0]}"
+                for k, c in ranked
+                if c.arguments_against
+            ][:3],
+            summary_comment=(
+                "Scores per criterion: "
+                + ", ".join(f"{_title(k)} {c.score}/5" for k, c in criteria.items())
+                + f". Overall score: {overall_score}/5."
+            ),
+            overall_score=overall_score,
+        )
+        return EvaluationResult(**criteria, summary=summary)
+
+    def _escalation_reason(self, result: Optional[EvaluationResult]) -> Optional[str]:
+        if result is None:
+            return "screening failed"
+        score = result.summary.overall_score
+        low, high = self.escalate_range
+        if low <= score < high:
+            return f"borderline score {score}"
+        criteria = [c.score for _, c in result if isinstance(c, CriterionEvaluation)]
+        if max(criteria) - min(criteria) > self.max_spread:
+            return f"criterion scores disagree ({min(criteria)} to {max(criteria)})"
+        return None
+
+    def _decide(
+        self,
+        tier: str,
+        judge: "Judge",
+        result: EvaluationResult,
+        reason: Optional[str] = None,
+    ) -> tuple[EvaluationResult, JudgeDecision]:
+        decision = JudgeDecision(
+            tier, judge.llm.model_name, result.summary.overall_score, reason
+        )
+        if self.screen is None:
+            return result, decision
+
+        self.decisions.append(decision)
+        print(
+            f"[DEBUG] Evaluation decided by {tier} judge '{decision.model_name}' "
+            f"(score {decision.score})" + (f", escalated: {reason}" if reason else "")
+        )
+        return result, decision
+
+    def _from_journal(self, history: str) -> tuple[str, Optional[EvaluationResult]]:
+        key = DiskCache.make_key(self.llm.model_name, history)
+        journal = self.llm.journal
+        journaled = journal.replay("judge", key) if journal else None
+        if journaled is None:
+            return key, None
+        # entries of older runs do not name the deciding tier
+        tier = journaled.get("tier", "unknown")
+        print(
+            f"[DEBUG] Evaluation replayed from run journal ({key[:12]}), "
+            f"decided by {tier} judge '{journaled['model']}'."
+        )
+        if self.screen is not None:
+            self.decisions.append(
+                JudgeDecision(
+                    tier,
+                    journaled["model"],
+                    journaled["score"],
+                    journaled.get("escalation_reason"),
+                )
+            )
+        return key, EvaluationResult.model_validate(journaled["result"])
+
+    def _to_journal(
+        self, key: str, decided: tuple[EvaluationResult, JudgeDecision]
+    ) -> EvaluationResult:
+        result, decision = decided
+        journal = self.llm.journal
+        if journal:
+            journal.record(
+                "judge",
+                key,
+                model=decision.model_name,
+                tier=decision.tier,
+                escalation_reason=decision.escalation_reason,
+                score=result.summary.overall_score,
+                result=result.model_dump(),
+            )
+        return result
+
+    def evaluate(self, history: str) -> EvaluationResult:
+        key, result = self._from_journal(history)
+        if result is None:
+            result = self._to_journal(key, self._cascade(history))
+        return result
+
+    async def evaluate_async(self, history: str) -> EvaluationResult:
+        """Same as `evaluate`, requires the judges to be backed by an AsyncLLMClient."""
+        key, result = self._from_journal(history)
+        if result is None:
+            result = self._to_journal(key, await self._cascade_async(history))
+        return result
+
+    def _cascade(self, history: str) -> tuple[EvaluationResult, JudgeDecision]:
+        if self.screen is None:
+            return self._decide("single", self, self._evaluate(history))
+
+        try:
+            screened = self.screen.evaluate(history)
+        except Exception as e:
+            print(f"[WARNING] Screening evaluation failed: {e}")
+            screened = None
+
+        reason = self._escalation_reason(screened)
+        if reason is None:
+            return self._decide("screening", self.screen, screened)
+        return self._decide("full", self, self._evaluate(history), reason)
+
+    async def _cascade_async(
+        self, history: str
+    ) -> tuple[EvaluationResult, JudgeDecision]:
+        if self.screen is None:
+            return self._decide("single", self, await self._evaluate_async(history))
+
+        try:
+            screened = await self.screen.evaluate_async(history)
+        except Exception as e:
+            print(f"[WARNING] Screening evaluation failed: {e}")
+            screened = None
+
+        reason = self._escalation_reason(screened)
+        if reason is None:
+            return self._decide("screening", self.screen, screened)
+        return self._decide("full", self, await self._evaluate_async(history), reason)
+
+    def _evaluate(self, history: str) -> EvaluationResult:
+        if not self.per_criterion:
+            evalResult, _ = self.llm.chat(**self._prepare_chat(history))
+            return evalResult
+
+        with ThreadPoolExecutor(max_workers=len(CRITERIA)) as executor:
+            # the requests keep the session pin and the metric tags of the caller
+            futures = {
+                criterion: executor.submit(
+                    contextvars.copy_context().run,
+                    self.llm.chat,
+                    **self._prepare_criterion_chat(history, criterion),
+                )
+                for criterion in CRITERIA
+            }
+            criteria = {k: f.result()[0] for k, f in futures.items()}
+        return self._aggregate(criteria)
+
+    async def _evaluate_async(self, history: str) -> EvaluationResult:
+        if not self.per_criterion:
+            evalResult, _ = await self.llm.chat(**self._prepare_chat(history))
+            return evalResult
+
+        results = await asyncio.gather(
+            *(
+                self.llm.chat(**self._prepare_criterion_chat(history, criterion))
+                for criterion in CRITERIA
+            )
+        )
+        return self._aggregate({k: r[0] for k, r in zip(CRITERIA, results)})
+
+
+class Refinement:
+    """
+    Bookkeeping of a reflect/improve loop: keeps the best evaluated candidate
+    and decides when further rounds are not worth it. The loop stops once the
+    overall score reaches `target_score` and no criterion is below
+    `min_criterion_score`, once a round improves the score by less than
+    `min_improvement`, or after `iterations` improvement rounds.
+    """
+
+    def __init__(
+        self,
+        iterations: int,
+        target_score: float,
+        min_criterion_score: int,
+        min_improvement: float,
+    ) -> None:
+        self.iterations = iterations
+        self.target_score = target_score
+        self.min_criterion_score = min_criterion_score
+        self.min_improvement = min_improvement
+        self.scores: list[float] = []
+        self.best = None
+
+    def record(self, result, history: list, evaluation: EvaluationResult) -> bool:
+        """Records the evaluation of a candidate, returns True if the loop should stop."""
+        score = evaluation.summary.overall_score
+        criteria = [
+            c.score for _, c in evaluation if isinstance(c, CriterionEvaluation)
+        ]
+        previous = self.scores[-1] if self.scores else None
+        self.scores.append(score)
+        if self.best is None or score > self.best[0]:
+            self.best = (score, result, history.copy())
+
+        print(
+            f"[DEBUG] Round {len(self.scores)}: overall score {score} "
+            f"(lowest criterion {min(criteria)}, best so far {self.best[0]})"
+        )
+        if score >= self.target_score and min(criteria) >= self.min_criterion_score:
+            print("[DEBUG] Target score reached, stopping refinement.")
+            return True
+        if previous is not None and score - previous < self.min_improvement:
+            print("[DEBUG] Score no longer improves, stopping refinement.")
+            return True
+        return len(self.scores) > self.iterations
@@ -1,9 +1,23 @@
+import contextlib
+import contextvars
+import itertools
 import ollama
 import pydantic
 import random
-from typing import List, Callable, Tuple, Optional
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Generator, Iterator, List, Callable, Tuple, Optional, TypeVar, Union
 
-from .judge import Judge, EvaluationResult
+from .cache import ResponseCache, request_key
+from .context import ContextWindowPolicy
+from .replay import Cassette
+from .journal import RunJournal
+from .metrics import CallMetrics, MetricsRecorder
+from .judge import Judge, EvaluationResult, Refinement
+from .compaction import HistoryCompactor
+from .tokens import TokenCounter
 from .messages import (
     Message,
     UserMessage,
@@ -11,6 +25,7 @@ from .messages import (
     SystemMessage,
 )
 from .handler import Handler, ToolHandler, FormatHandler
+from .handler.stream import StreamMonitor
 
 
 def _clean_thinking(response: str) -> str:
@@ -19,14 +34,174 @@ def _clean_thinking(response: str) -> str:
     return response
 
 
+_clients: dict[Optional[str], ollama.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def _shared_client(host: Optional[str]) -> ollama.Client:
+    # one pooled http client per host, shared by all LLMClient instances and threads
+    with _clients_lock:
+        if host not in _clients:
+            _clients[host] = ollama.Client(host=host)
+        return _clients[host]
+
+
+# conversation the requests of the current thread or task belong to, see `LLMClient.pinned`
+_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "session", default=None
+)
+
+
+@dataclass
+class _Exchange:
+    """One request and its (streamed) response, see `LLMClient._begin` and `_finish`."""
+
+    messages: list[Message]
+    request: dict
+    handlers: Optional[List[Handler]]
+    monitor: Optional[StreamMonitor]
+    verbose: bool
+    started: float
+    host: Optional[str] = None
+    queue_wait: float = 0.0
+    first_token: Optional[float] = None
+    # the complete response or, when streaming, the last chunk (carrying the stats)
+    final: Optional[ollama.ChatResponse] = None
+    chunks: list[str] = field(default_factory=list)
+    aborted: bool = False
+
+    def feed(self, chunk: ollama.ChatResponse) -> bool:
+        """Takes a streamed chunk, returns False once the generation should be cancelled."""
+        content = chunk.message.content
+        if self.verbose and self.final is None:
+            AssistantMessage("")._print_title()
+        self.final = chunk
+        if self.first_token is None and content:
+            self.first_token = time.perf_counter()
+        if self.verbose:
+            print(content, end="", flush=True)
+        self.chunks.append(content)
+        if self.monitor and not self.monitor.feed(content):
+            self.aborted = True
+        return not self.aborted
+
+
+# Steps of a conversation. The conversation logic (`LLMClient._chat_steps` etc.)
+# is written once as a generator yielding these steps; LLMClient executes them
+# blocking and AsyncLLMClient awaits them.
+
+
+@dataclass
+class _Respond:
+    """The model's response to `messages`, see `LLMClient._get_response`."""
+
+    messages: list[Message]
+    verbose: bool
+    format: Optional[dict] = None
+    handlers: Optional[List[Handler]] = None
+    validate: bool = True
+
+
+@dataclass
+class _Invoke:
+    """`handler.invoke(content)`, which may run tools."""
+
+    handler: Handler
+    content: str
+
+
+@dataclass
+class _Compact:
+    compactor: HistoryCompactor
+    messages: list[Message]
+
+
+@dataclass
+class _Evaluate:
+    judge: Judge
+    history: str
+
+
+_Step = Union[_Respond, _Invoke, _Compact, _Evaluate]
+_T = TypeVar("_T")
+
+
 class LLMClient:
-    def __init__(self, model_name: str = "mistral-nemo:latest") -> None:
+    def __init__(
+        self,
+        model_name: str = "mistral-nemo:latest",
+        host: Optional[Union[str, List[str]]] = None,
+        cache: Optional[ResponseCache] = None,
+        seed: Optional[int] = None,
+    ) -> None:
         self.model_name = model_name
+        # several hosts serving the same model are used round robin, except
+        # for pinned sessions, which always go to the same host
+        self.hosts = host if isinstance(host, list) else [host]
+        self._round_robin = itertools.count()
+        self.cache = cache
+        # pin the seed for reproducible responses, random per request otherwise
+        self.seed = seed
+        # records all requests and responses if set
+        self.cassette: Optional[Cassette] = None
+        # journals all responses and replays those of an interrupted run if set
+        self.journal: Optional[RunJournal] = None
+        # records the latency and throughput of every request if set
+        self.metrics: Optional[MetricsRecorder] = None
         self.context_window = 2048
         self.context_window_dynamic = False
+        self.context_policy = ContextWindowPolicy.for_model(model_name)
+        self.token_counter = TokenCounter.for_model(model_name)
+        # tokens kept free for the response when sizing the context window dynamically
+        self.response_reserve = 2048
+        # how long the server keeps the model (and its prompt cache) loaded after a request
+        self.keep_alive: Optional[Union[str, float]] = None
         self.debug = False
 
-    def _get_response(self, messages: list[Message], verbose: bool) -> str:
+    @property
+    def host(self) -> Optional[str]:
+        if len(self.hosts) == 1:
+            return self.hosts[0]
+        session = _session.get()
+        if session is None:
+            return self.hosts[next(self._round_robin) % len(self.hosts)]
+        return self.hosts[zlib.crc32(session.encode("utf-8")) % len(self.hosts)]
+
+    @staticmethod
+    @contextlib.contextmanager
+    def pinned(session: str) -> Iterator[None]:
+        """
+        Marks the requests made within the block (in the current thread or task) as
+        one conversation. They are sent to the same host, whose prompt cache then
+        still holds the shared prefix of the previous turns.
+        """
+        token = _session.set(session)
+        try:
+            yield
+        finally:
+            _session.reset(token)
+
+    def warm_up(self) -> None:
+        """Loads the model on all hosts without generating, so that the first request does not wait for it."""
+        # with the context window of the first requests, a different one would reload the model
+        num_ctx = (
+            self.context_window
+            if not self.context_window_dynamic
+            else self.context_policy.resolve(
+                self.context_policy.min_size + self.response_reserve
+            )
+        )
+        for host in self.hosts:
+            _shared_client(host).chat(
+                model=self.model_name,
+                messages=[],
+                options={"num_ctx": num_ctx},
+                keep_alive=self.keep_alive,
+            )
+
+    def _prepare_request(
+        self, messages: list[Message], stream: bool, format: Optional[dict] = None
+    ) -> dict:
         if self.debug:
             _ = input("Enter to clear the screen and continue...")
             import os
@@ -35,52 +210,296 @@ class LLMClient:
             for message in messages:
                 message.print()
 
-        total_word_count = sum(len(m.content.split()) for m in messages)
+        input_tokens = self.token_counter.count_messages(messages)
         context_windows = (
             self.context_window
             if not self.context_window_dynamic
-            else int(total_word_count * 1.5)
+            else self.context_policy.resolve(input_tokens + self.response_reserve)
         )
         print(
-            f"[DEBUG] Input word count: {total_word_count} / Context window: {context_windows}"
+            f"[DEBUG] Input tokens: {input_tokens} ({self.token_counter.source}) / Context window: {context_windows}"
         )
+        if input_tokens > context_windows:
+            print(
+                f"[WARNING] Input exceeds the context window by {input_tokens - context_windows} tokens and will be truncated."
+            )
 
-        response = ollama.chat(
-            self.model_name,
-            messages=[m.__dict__ for m in messages],
-            stream=verbose,
+        return dict(
+            model=self.model_name,
+            messages=[m.to_dict() for m in messages],
+            stream=stream,
+            format=format,
+            keep_alive=self.keep_alive,
             options={
                 "temperature": 0.5,
                 "top_p": 0.9,
                 "num_ctx": context_windows,
-                "seed": random.randint(0, 2**30 - 1),
+                "seed": (
+                    self.seed if self.seed is not None else random.randint(0, 2**30 - 1)
+                ),
             },
         )
 
-        if not verbose:
-            response = _clean_thinking(response.message.content)
-            return AssistantMessage(response)
+    def _on_response(
+        self,
+        messages: list[Message],
+        request: dict,
+        content: str,
+        final: ollama.ChatResponse,
+    ) -> None:
+        # `final` is the complete response or, when streaming, the last chunk carrying the stats
+        if self.cassette:
+            self.cassette.record(request, content, final)
+        if not final.done:
+            return  # aborted early, no stats available
+        self.context_policy.record_load(
+            request["options"]["num_ctx"], final.load_duration
+        )
+        cached = self.token_counter.record_usage(
+            messages, final.prompt_eval_count, final.eval_count
+        )
+        counter = self.token_counter
+        print(
+            f"[DEBUG] Tokens: prompt {final.prompt_eval_count} (~{cached:.0%} cached) / completion {final.eval_count} "
+            f"(total for '{self.model_name}': prompt {counter.prompt_tokens} (~{counter.cached_ratio:.0%} cached) / "
+            f"completion {counter.completion_tokens})"
+        )
 
-        AssistantMessage("")._print_title()
-        chunks = []
-        for chunk in response:
-            chunk = chunk.message.content
-            print(chunk, end="", flush=True)
-            chunks.append(chunk)
-        print()
-        response = "".join(chunks)
+    def _record_call(self, exchange: _Exchange, content: str, source: str) -> None:
+        if not self.metrics:
+            return
+        handlers = exchange.handlers or []
+        content = _clean_thinking(content)
+        # the first handler taking the response is the one consuming it
+        handler = next(
+            (
+                type(h).__name__.removesuffix("Handler").lower()
+                for h in handlers
+                if h.consider(content)
+            ),
+            "text",
+        )
+        first_token = exchange.first_token
+        call = CallMetrics(
+            model=self.model_name,
+            host=exchange.host,
+            source=source,
+            handler=handler,
+            retries=sum(h.attempt for h in handlers),
+            queue_wait=exchange.queue_wait,
+            time_to_first_token=(
+                first_token - exchange.started if first_token is not None else None
+            ),
+            duration=time.perf_counter() - exchange.started,
+            tags=MetricsRecorder.tags(),
+        )
+        final = exchange.final
+        if final is not None and not final.done:
+            call.aborted = True
+        elif final is not None:
+            # Ollama reports durations in nanoseconds
+            call.prompt_tokens = final.prompt_eval_count
+            call.completion_tokens = final.eval_count
+            call.load_seconds = (final.load_duration or 0) / 1e9
+            call.prompt_eval_seconds = (final.prompt_eval_duration or 0) / 1e9
+            call.eval_seconds = (final.eval_duration or 0) / 1e9
+        self.metrics.record(call)
+
+    def _journal_response(self, request: dict, content: str) -> None:
+        if self.journal:
+            self.journal.record(
+                "llm",
+                request_key(request, include_seed=False),
+                model=self.model_name,
+                content=content,
+            )
+
+    def _from_cache(
+        self, request: dict, verbose: bool
+    ) -> Optional[Tuple[AssistantMessage, str]]:
+        """The journaled or cached response and where it came from, None if there is none."""
+        if self.journal:
+            # the seed of a replayed request was random, any seed matches
+            key = request_key(request, include_seed=False)
+            journaled = self.journal.replay("llm", key)
+            if journaled is not None:
+                print(f"[DEBUG] Response replayed from run journal ({key[:12]}).")
+                return AssistantMessage(journaled["content"]).print(verbose), "journal"
+
+        if not self.cache:
+            return None
+
+        key = self.cache.key(request, include_seed=self.seed is not None)
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+
+        print(f"[DEBUG] Response served from cache ({key[:12]}).")
+        self._journal_response(request, cached["content"])
+        return AssistantMessage(cached["content"]).print(verbose), "cache"
+
+    def _to_message(
+        self, request: dict, response: str, cacheable: bool = True
+    ) -> AssistantMessage:
         response = _clean_thinking(response)
+        if self.cache and cacheable:
+            key = self.cache.key(request, include_seed=self.seed is not None)
+            self.cache.put(key, {"content": response})
+        # aborted responses too, replaying them leads to the same retry
+        self._journal_response(request, response)
         return AssistantMessage(response)
 
-    def _force_handler(
+    @staticmethod
+    def _stream_monitor(handlers: Optional[List[Handler]]) -> Optional[StreamMonitor]:
+        if not handlers:
+            return None
+        validators = [h.stream_validator() for h in handlers]
+        if None in validators:
+            return None
+        return StreamMonitor(validators)
+
+    def _begin(
+        self,
+        messages: list[Message],
+        verbose: bool,
+        format: Optional[dict],
+        handlers: Optional[List[Handler]],
+        validate: bool,
+    ) -> Tuple[_Exchange, Optional[AssistantMessage]]:
+        """Prepares the request, returns the exchange and the cached response if there is one."""
+        monitor = self._stream_monitor(handlers) if validate else None
+        stream = verbose or monitor is not None
+        exchange = _Exchange(
+            messages=messages,
+            request=self._prepare_request(messages, stream, format),
+            handlers=handlers,
+            monitor=monitor,
+            verbose=verbose,
+            started=time.perf_counter(),
+        )
+        cached = self._from_cache(exchange.request, verbose)
+        if not cached:
+            return exchange, None
+        message, source = cached
+        self._record_call(exchange, message.content, source)
+        return exchange, message
+
+    def _finish(
+        self, exchange: _Exchange, response: Optional[ollama.ChatResponse] = None
+    ) -> AssistantMessage:
+        """Completes the exchange with the whole `response` or, when streaming, the chunks fed."""
+        if response is not None:
+            # without streaming, the first token arrives with the last
+            exchange.first_token = time.perf_counter()
+            exchange.final = response
+            content = response.message.content
+        else:
+            if exchange.verbose:
+                print()
+            if exchange.final is None:
+                raise ollama.ResponseError("The response stream ended without a chunk.")
+            content = "".join(exchange.chunks)
+        if exchange.aborted:
+            print(
+                f"[DEBUG] Generation aborted after {len(content)} characters, "
+                "the response can no longer be handled."
+            )
+        self._on_response(exchange.messages, exchange.request, content, exchange.final)
+        self._record_call(exchange, content, "server")
+        return self._to_message(
+            exchange.request, content, cacheable=not exchange.aborted
+        )
+
+    def _get_response(
+        self,
+        messages: list[Message],
+        verbose: bool,
+        format: Optional[dict] = None,
+        handlers: Optional[List[Handler]] = None,
+        validate: bool = True,
+    ) -> AssistantMessage:
+        """
+        If `handlers` are given (and `validate` is set), the response is streamed and
+        validated on the fly, and the generation is cancelled as soon as none of them
+        can consume it anymore.
+        """
+        exchange, cached = self._begin(messages, verbose, format, handlers, validate)
+        if cached:
+            return cached
+
+        exchange.host = self.host
+        response = _shared_client(exchange.host).chat(**exchange.request)
+        if not exchange.request["stream"]:
+            return self._finish(exchange, response)
+
+        for chunk in response:
+            if not exchange.feed(chunk):
+                # closing the stream disconnects, which stops the generation on the server
+                response.close()
+                break
+        return self._finish(exchange)
+
+    def _step(self, step: _Step):
+        if isinstance(step, _Respond):
+            return self._get_response(
+                step.messages, step.verbose, step.format, step.handlers, step.validate
+            )
+        if isinstance(step, _Invoke):
+            return step.handler.invoke(step.content)
+        if isinstance(step, _Compact):
+            return step.compactor.compact(step.messages)
+        return step.judge.evaluate(step.history)
+
+    def _drive(self, steps: Generator[_Step, object, _T]) -> _T:
+        """Runs a conversation (see `_chat_steps`) to its end, step by step."""
+        result = None
+        while True:
+            try:
+                step = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            result = self._step(step)
+
+    def _prepare_handlers(
+        self, tools: Optional[List[Callable]], format: Optional[pydantic.BaseModel]
+    ) -> Tuple[Optional[ToolHandler], Optional[FormatHandler], str]:
+        handler_tools, handler_format = None, None
+        instructions = ""
+        if tools:
+            handler_tools = ToolHandler(tools, journal=self.journal)
+            instructions += handler_tools.instructions
+        if tools and format:
+            instructions += (
+                "\n\n---\n"
+                "You can either use the tool(s) outlined above OR format your final according to the following instructions.\n"
+                "---\n\n"
+            )
+        if format:
+            # constrained decoding would rule out tool invocations
+            handler_format = FormatHandler(format, native=not tools)
+            instructions += handler_format.instructions
+        return handler_tools, handler_format, instructions
+
+    @staticmethod
+    def _evaluation_message(result: EvaluationResult) -> SystemMessage:
+        return SystemMessage(
+            (
+                f"Your response has been evaluated:\n\n"
+                f"{result.model_dump_json(indent=2)}"
+            )
+        )
+
+    def _force_handler_steps(
         self, history: List[Message], handler: Handler, verbose: bool
-    ) -> Tuple[Message, List[Message]]:
+    ) -> Generator[_Step, object, Tuple[Message, List[Message]]]:
         model_input = history.copy()
-        model_input.append(SystemMessage(handler.instructions).print(verbose))
+        instructions = [SystemMessage(handler.instructions).print(verbose)]
 
         while True:
-            ai_message = self._get_response(model_input, verbose)
-            ok, response = handler.invoke(ai_message.content)
+            ai_message = yield _Respond(
+                model_input + instructions, verbose, handler.response_format, [handler]
+            )
+            ok, response = yield _Invoke(handler, ai_message.content)
             if not ok:
                 model_input.append(ai_message)
                 model_input.append(response.print(verbose))
@@ -91,34 +510,39 @@ class LLMClient:
                 history.append(response.print(verbose))
             return response, history
 
-    def chat(
+    def _chat_steps(
         self,
         message: str,
-        history: List[Message] = [],
-        format: Optional[pydantic.BaseModel] = None,
-        verbose: bool = True,
-        tools: Optional[List[Callable]] = None,
-        tools_forced_sequence: bool = False,
-    ) -> Tuple[Message, List[Message]]:
+        history: List[Message],
+        format: Optional[pydantic.BaseModel],
+        verbose: bool,
+        tools: Optional[List[Callable]],
+        tools_forced_sequence: bool,
+        compactor: Optional[HistoryCompactor] = None,
+    ) -> Generator[_Step, object, Tuple[Message, List[Message]]]:
         history = history.copy()
         history.append(UserMessage(message).print(verbose))
 
         if not tools and not format:
-            ai_message = self._get_response(history, verbose)
+            ai_message = yield _Respond(history, verbose)
             history.append(ai_message)
             return ai_message.content, history
 
         if tools_forced_sequence:
             for tool in tools:
-                handler = ToolHandler([tool])
-                response, history = self._force_handler(history, handler, verbose)
+                handler = ToolHandler([tool], journal=self.journal)
+                response, history = yield from self._force_handler_steps(
+                    history, handler, verbose
+                )
 
             if format:
-                handler = FormatHandler(format)
-                response, history = self._force_handler(history, handler, verbose)
+                handler = FormatHandler(format, native=True)
+                response, history = yield from self._force_handler_steps(
+                    history, handler, verbose
+                )
             elif tools:
                 # if tools were used but no format is provided, we need to invoke the LLm once more to get the final response
-                ai_message = self._get_response(history, verbose)
+                ai_message = yield _Respond(history, verbose)
                 history.append(ai_message)
                 response = ai_message.content
 
@@ -126,28 +550,29 @@ class LLMClient:
 
         model_input = history.copy()
 
-        instructions = ""
-        if tools:
-            handler_tools = ToolHandler(tools)
-            instructions += handler_tools.instructions
-        if tools and format:
-            instructions += (
-                "\n\n---\n"
-                "You can either use the tool(s) outlined above OR format your final according to the following instructions.\n"
-                "---\n\n"
-            )
-        if format:
-            handler_format = FormatHandler(format)
-            instructions += handler_format.instructions
-
-        if tools or format:
-            model_input.append(SystemMessage(instructions).print(verbose))
+        handler_tools, handler_format, instructions = self._prepare_handlers(
+            tools, format
+        )
+        # the instructions go last, so that the history stays a stable prefix
+        # which the server can serve from its prompt cache across requests
+        volatile = (
+            [SystemMessage(instructions).print(verbose)] if tools or format else []
+        )
 
         while True:
-            ai_message = self._get_response(model_input, verbose)
+            if compactor:
+                model_input = yield _Compact(compactor, model_input)
+            ai_message = yield _Respond(
+                model_input + volatile,
+                verbose,
+                handler_format.response_format if handler_format else None,
+                [h for h in (handler_tools, handler_format) if h],
+                # without a format, any plain response is a valid final answer
+                validate=bool(format),
+            )
 
             if tools and handler_tools.consider(ai_message.content):
-                ok, response = handler_tools.invoke(ai_message.content)
+                ok, response = yield _Invoke(handler_tools, ai_message.content)
                 model_input.append(ai_message)
                 model_input.append(response.print(verbose))
                 if not ok:
@@ -156,7 +581,7 @@ class LLMClient:
                 history.append(response)
                 continue
             if format:
-                ok, response = handler_format.invoke(ai_message.content)
+                ok, response = yield _Invoke(handler_format, ai_message.content)
                 if not ok:
                     model_input.append(ai_message)
                     model_input.append(response.print(verbose))
@@ -166,49 +591,95 @@ class LLMClient:
 
             return ai_message.content, history
 
-    def chat_reflect_improve(
+    def _chat_reflect_improve_steps(
         self,
         judge: Judge,
         message: str,
+        history: List[Message],
+        format: Optional[pydantic.BaseModel],
+        verbose: bool,
+        tools: Optional[List[Callable]],
+        tools_forced_sequence: bool,
+        iterations: int,
+        target_score: float,
+        min_criterion_score: int,
+        min_improvement: float,
+    ) -> Generator[_Step, object, Tuple[Message, List[Message]]]:
+        result, history = yield from self._chat_steps(
+            message, history, format, verbose, tools, tools_forced_sequence
+        )
+
+        refinement = Refinement(
+            iterations, target_score, min_criterion_score, min_improvement
+        )
+        while True:
+            inputs_ = "\n".join([h._get_printable() for h in history])
+            evaluation: EvaluationResult = yield _Evaluate(judge, inputs_)
+            if refinement.record(result, history, evaluation):
+                break
+
+            print(f"[DEBUG] Improvement round {len(refinement.scores)} of {iterations}")
+            history.append(self._evaluation_message(evaluation).print(verbose))
+            result, history = yield from self._chat_steps(
+                "Please reflect on the evaluation and improve your answer accordingly.",
+                history,
+                format,
+                verbose,
+                tools,
+                tools_forced_sequence,
+            )
+
+        _, result, history = refinement.best
+        return result, history
+
+    def chat(
+        self,
+        message: str,
         history: List[Message] = [],
         format: Optional[pydantic.BaseModel] = None,
         verbose: bool = True,
         tools: Optional[List[Callable]] = None,
         tools_forced_sequence: bool = False,
-        iterations: int = 2,
+        compactor: Optional[HistoryCompactor] = None,
     ) -> Tuple[Message, List[Message]]:
-
-        result, history = self.chat(
-            message=message,
-            history=history,
-            format=format,
-            verbose=verbose,
-            tools=tools,
-            tools_forced_sequence=tools_forced_sequence,
-        )
-
-        for _ in range(iterations):
-            print(f"[DEBUG] Iteration {_ + 1} of {iterations}")
-            inputs_ = "\n".join([h._get_printable() for h in history])
-            result: EvaluationResult = judge.evaluate(inputs_)
-            history.append(
-                SystemMessage(
-                    (
-                        f"Your response has been evaluated:\n\n"
-                        f"{result.model_dump_json(indent=2)}"
-                    )
-                ).print(verbose)
+        return self._drive(
+            self._chat_steps(
+                message,
+                history,
+                format,
+                verbose,
+                tools,
+                tools_forced_sequence,
+                compactor,
             )
+        )
 
-            result, history = self.chat(
-                message=(
-                    "Please reflect on the evaluation and improve your answer accordingly."
-                ),
-                history=history,
-                format=format,
-                verbose=verbose,
-                tools=tools,
-                tools_forced_sequence=tools_forced_sequence,
+    def chat_reflect_improve(
+        self,
+        judge: Judge,
+        message: str,
+        history: List[Message] = [],
+        format: Optional[pydantic.BaseModel] = None,
+        verbose: bool = True,
+        tools: Optional[List[Callable]] = None,
+        tools_forced_sequence: bool = False,
+        iterations: int = 2,
+        target_score: float = 4.5,
+        min_criterion_score: int = 4,
+        min_improvement: float = 0.1,
+    ) -> Tuple[Message, List[Message]]:
+        return self._drive(
+            self._chat_reflect_improve_steps(
+                judge,
+                message,
+                history,
+                format,
+                verbose,
+                tools,
+                tools_forced_sequence,
+                iterations,
+                target_score,
+                min_criterion_score,
+                min_improvement,
             )
-
-        return result, history
+        )
@@ -0,0 +1,176 @@
+import asyncio
+import httpx
+import ollama
+import pydantic
+import time
+import weakref
+from typing import Generator, List, Callable, Tuple, Optional, Union
+
+from .cache import ResponseCache
+from .llm import LLMClient, _Compact, _Invoke, _Respond, _Step, _T
+from .judge import Judge
+from .compaction import HistoryCompactor
+from .messages import Message, AssistantMessage
+from .handler import Handler
+
+
+class _ConnectionPool:
+    """
+    Pooled `ollama.AsyncClient` plus a semaphore limiting the number of requests in flight.
+    Callers exceeding the limit wait for a free slot, which propagates backpressure
+    up to whoever is producing the requests.
+    """
+
+    def __init__(self, host: Optional[str], max_concurrency: int) -> None:
+        self.client = ollama.AsyncClient(
+            host=host,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    Asynchronous counterpart of LLMClient with identical `chat` and
+    `chat_reflect_improve` semantics: both run the same conversation steps,
+    this client awaits them instead of blocking.
+
+    All instances talking to the same host with the same `max_concurrency`
+    within one event loop share a single connection pool and concurrency limit.
+    Match `max_concurrency` to the server's `OLLAMA_NUM_PARALLEL` so that
+    requests queue client side instead of on the server.
+    """
+
+    _pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def __init__(
+        self,
+        model_name: str = "mistral-nemo:latest",
+        host: Optional[Union[str, List[str]]] = None,
+        cache: Optional[ResponseCache] = None,
+        seed: Optional[int] = None,
+        max_concurrency: int = 4,
+    ) -> None:
+        super().__init__(model_name, host, cache, seed)
+        assert max_concurrency >= 1, "max_concurrency must be at least 1."
+        self.max_concurrency = max_concurrency
+
+    def _pool(self, host: Optional[str]) -> _ConnectionPool:
+        pools = self._pools.setdefault(asyncio.get_running_loop(), {})
+        key = (host, self.max_concurrency)
+        if key not in pools:
+            pools[key] = _ConnectionPool(host, self.max_concurrency)
+        return pools[key]
+
+    async def _get_response(
+        self,
+        messages: list[Message],
+        verbose: bool,
+        format: Optional[dict] = None,
+        handlers: Optional[List[Handler]] = None,
+        validate: bool = True,
+    ) -> AssistantMessage:
+        exchange, cached = self._begin(messages, verbose, format, handlers, validate)
+        if cached:
+            return cached
+
+        exchange.host = self.host
+        pool = self._pool(exchange.host)
+
+        pool.waiting += 1
+        async with pool.semaphore:
+            pool.waiting -= 1
+            pool.in_flight += 1
+            exchange.queue_wait = time.perf_counter() - exchange.started
+            try:
+                response = await pool.client.chat(**exchange.request)
+                if not exchange.request["stream"]:
+                    return self._finish(exchange, response)
+
+                async for chunk in response:
+                    if not exchange.feed(chunk):
+                        await response.aclose()
+                        break
+            finally:
+                pool.in_flight -= 1
+        return self._finish(exchange)
+
+    async def _step(self, step: _Step):
+        if isinstance(step, _Respond):
+            return await self._get_response(
+                step.messages, step.verbose, step.format, step.handlers, step.validate
+            )
+        if isinstance(step, _Invoke):
+            # tools are plain (blocking) functions, keep them off the event loop
+            return await asyncio.to_thread(step.handler.invoke, step.content)
+        if isinstance(step, _Compact):
+            return await step.compactor.compact_async(step.messages)
+        return await step.judge.evaluate_async(step.history)
+
+    async def _drive(self, steps: Generator[_Step, object, _T]) -> _T:
+        result = None
+        while True:
+            try:
+                step = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            result = await self._step(step)
+
+    async def chat(
+        self,
+        message: str,
+        history: List[Message] = [],
+        format: Optional[pydantic.BaseModel] = None,
+        verbose: bool = True,
+        tools: Optional[List[Callable]] = None,
+        tools_forced_sequence: bool = False,
+        compactor: Optional[HistoryCompactor] = None,
+    ) -> Tuple[Message, List[Message]]:
+        return await self._drive(
+            self._chat_steps(
+                message,
+                history,
+                format,
+                verbose,
+                tools,
+                tools_forced_sequence,
+                compactor,
+            )
+        )
+
+    async def chat_reflect_improve(
+        self,
+        judge: Judge,
+        message: str,
+        history: List[Message] = [],
+        format: Optional[pydantic.BaseModel] = None,
+        verbose: bool = True,
+        tools: Optional[List[Callable]] = None,
+        tools_forced_sequence: bool = False,
+        iterations: int = 2,
+        target_score: float = 4.5,
+        min_criterion_score: int = 4,
+        min_improvement: float = 0.1,
+    ) -> Tuple[Message, List[Message]]:
+        return await self._drive(
+            self._chat_reflect_improve_steps(
+                judge,
+                message,
+                history,
+                format,
+                verbose,
+                tools,
+                tools_forced_sequence,
+                iterations,
+                target_score,
+                min_criterion_score,
+                min_improvement,
+            )
+        )
@@ -1,15 +1,20 @@
 from typing import Self
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
 class Message:
     role: str
     content: str
+    # memoized token counts, see TokenCounter
+    token_counts: dict = field(default_factory=dict, repr=False, compare=False)
 
     def __str__(self) -> str:
         return f"{self.role}: {self.content}"
 
+    def to_dict(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
     def _get_title(self) -> str:
         return f" {self.role.capitalize()} ".center(80, "=")
 
@@ -0,0 +1,139 @@
+import collections
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, Optional
+
+# tags of the requests made in the current thread or task, see `MetricsRecorder.tagged`
+_tags: contextvars.ContextVar[dict] = contextvars.ContextVar("tags", default={})
+
+# labels of the Prometheus series, the remaining tags (e.g. task) are only traced
+LABELS = ("model", "phase", "handler", "source")
+
+# counter name -> (help, value of a call)
+COUNTERS = {
+    "calls": ("Requests made.", lambda c: 1),
+    "retries": ("Requests retrying a rejected response.", lambda c: c.retries > 0),
+    "aborted": ("Generations cancelled early.", lambda c: c.aborted),
+    "prompt_tokens": ("Prompt tokens evaluated.", lambda c: c.prompt_tokens or 0),
+    "completion_tokens": ("Tokens generated.", lambda c: c.completion_tokens or 0),
+    "queue_wait_seconds": (
+        "Time waiting for a free connection.",
+        lambda c: c.queue_wait,
+    ),
+    "time_to_first_token_seconds": (
+        "Time until the first token arrived.",
+        lambda c: c.time_to_first_token or 0.0,
+    ),
+    "duration_seconds": ("Time until the response was complete.", lambda c: c.duration),
+    "load_seconds": ("Time spent loading the model.", lambda c: c.load_seconds or 0.0),
+    "prompt_eval_seconds": (
+        "Time spent evaluating the prompt.",
+        lambda c: c.prompt_eval_seconds or 0.0,
+    ),
+    "eval_seconds": ("Time spent generating.", lambda c: c.eval_seconds or 0.0),
+}
+
+
+@dataclass
+class CallMetrics:
+    model: str
+    host: Optional[str]
+    # "server", or "journal" and "cache" for responses that were not generated
+    source: str
+    # which handler the response is for ("text" if none)
+    handler: str
+    # rejected responses before this one in the same conversation turn
+    retries: int
+    queue_wait: float
+    time_to_first_token: Optional[float]
+    duration: float
+    aborted: bool = False
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    load_seconds: Optional[float] = None
+    prompt_eval_seconds: Optional[float] = None
+    eval_seconds: Optional[float] = None
+    tags: dict = field(default_factory=dict)
+    time: float = field(default_factory=time.time)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if not self.completion_tokens or not self.eval_seconds:
+            return None
+        return self.completion_tokens / self.eval_seconds
+
+
+class MetricsRecorder:
+    """
+    Collects the metrics of every model request, tagged with the phase and task
+    (or any other tags) set by `tagged` around the code making the requests.
+
+    Calls are appended to a JSONL trace at `trace_path` if given, and summed up
+    per model, phase, handler and source for `prometheus`.
+    """
+
+    def __init__(self, trace_path: Optional[str] = None) -> None:
+        self.trace_path = trace_path
+        self.totals: dict[tuple, collections.Counter] = collections.defaultdict(
+            collections.Counter
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def tagged(**tags) -> Iterator[None]:
+        """Tags the requests made within the block (in the current thread or task)."""
+        token = _tags.set({**_tags.get(), **tags})
+        try:
+            yield
+        finally:
+            _tags.reset(token)
+
+    @staticmethod
+    def tags() -> dict:
+        return _tags.get()
+
+    def record(self, call: CallMetrics) -> None:
+        labels = tuple(
+            getattr(call, label, None) or call.tags.get(label, "") for label in LABELS
+        )
+        line = None
+        if self.trace_path:
+            entry = {**asdict(call), "tokens_per_second": call.tokens_per_second}
+            line = json.dumps(entry, ensure_ascii=False)
+
+        with self._lock:
+            totals = self.totals[labels]
+            for name, (_, value) in COUNTERS.items():
+                totals[name] += value(call)
+            if line:
+                os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+                with open(self.trace_path, "a", encoding="utf-8") as file:
+                    file.write(line + "\n")
+
+    def prometheus(self) -> str:
+        """The totals in the Prometheus text exposition format."""
+        with self._lock:
+            totals = {labels: counter.copy() for labels, counter in self.totals.items()}
+
+        lines = []
+        for name, (help, _) in COUNTERS.items():
+            metric = f"kollektiv_llm_{name}_total"
+            lines.append(f"# HELP {metric} {help}")
+            lines.append(f"# TYPE {metric} counter")
+            for labels, counter in sorted(totals.items()):
+                rendered = ",".join(
+                    f'{label}="{_escape(str(value))}"'
+                    for label, value in zip(LABELS, labels)
+                )
+                lines.append(f"{metric}{{{rendered}}} {float(counter[name]):g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,250 @@
+"""
+Record/replay of model interactions.
+
+A Cassette captures every request/response pair an LLMClient sends to Ollama.
+The ReplayServer is a local stand-in for Ollama speaking the `/api/chat`
+protocol, serving the recorded responses with configurable simulated latency.
+Point an LLMClient at it via `host` to run the pipeline without a GPU:
+
+    python -m kollektiv.llm.replay cassette.jsonl --port 11435 --latency 0.5
+"""
+
+import argparse
+import collections
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .cache import request_key
+
+STAT_FIELDS = [
+    "done_reason",
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+]
+
+
+class Cassette:
+    """Append-only JSONL file of recorded request/response pairs."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, request: dict, content: str, final) -> None:
+        entry = {
+            "key": request_key(request, include_seed=False),
+            "request": {k: v for k, v in request.items() if k != "stream"},
+            "response": {
+                "content": content,
+                **{f: getattr(final, f, None) for f in STAT_FIELDS},
+            },
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+    def load(self) -> list[dict]:
+        with open(self.path, "r", encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+
+class ReplayServer:
+    """
+    Serves the responses of a Cassette over the Ollama `/api/chat` protocol.
+
+    Requests are matched by `request_key`, identical requests are answered in
+    recorded order. Unmatched requests get the next response in recording order,
+    or an error if `strict` is set.
+
+    Simulated latency: `latency` seconds before the first token, plus the
+    durations recorded by Ollama divided by `speed` if given (`speed=1.0` replays
+    in real time, `speed=None` skips the recorded durations).
+    """
+
+    def __init__(
+        self,
+        cassette_path: str,
+        latency: float = 0.0,
+        speed: Optional[float] = None,
+        strict: bool = False,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.entries = Cassette(cassette_path).load()
+        self.latency = latency
+        self.speed = speed
+        self.strict = strict
+
+        self._by_key: dict[str, collections.deque] = collections.defaultdict(
+            collections.deque
+        )
+        for entry in self.entries:
+            self._by_key[entry["key"]].append(entry)
+        self._next = 0
+        self._served: set[int] = set()
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), _ReplayRequestHandler)
+        self.server.daemon_threads = True
+        self.server.replay = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "ReplayServer":
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def match(self, request: dict) -> Optional[dict]:
+        key = request_key(request, include_seed=False)
+        with self._lock:
+            candidates = self._by_key.get(key)
+            if candidates:
+                entry = candidates.popleft() if len(candidates) > 1 else candidates[0]
+                self._served.add(id(entry))
+                return entry
+            if self.strict:
+                return None
+
+            while self._next < len(self.entries):
+                entry = self.entries[self._next]
+                self._next += 1
+                if id(entry) not in self._served:
+                    self._served.add(id(entry))
+                    return entry
+            return None
+
+    def delays(self, response: dict, chunks: int) -> tuple[float, float]:
+        """Seconds to wait before the first chunk and between the following chunks."""
+        first, per_chunk = self.latency, 0.0
+        if self.speed:
+            ns = (response.get("load_duration") or 0) + (
+                response.get("prompt_eval_duration") or 0
+            )
+            first += ns / 1e9 / self.speed
+            per_chunk = (response.get("eval_duration") or 0) / 1e9 / self.speed
+            per_chunk /= max(chunks, 1)
+        return first, per_chunk
+
+
+class _ReplayRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/api/version":
+            return self._send_json(200, {"version": "replay"})
+        if self.path == "/api/tags":
+            replay: ReplayServer = self.server.replay
+            models = sorted({e["request"]["model"] for e in replay.entries})
+            return self._send_json(200, {"models": [{"name": m} for m in models]})
+        self._send_json(404, {"error": f"unknown path '{self.path}'"})
+
+    def do_POST(self) -> None:
+        if self.path != "/api/chat":
+            return self._send_json(404, {"error": f"unknown path '{self.path}'"})
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        replay: ReplayServer = self.server.replay
+        entry = replay.match(request)
+        if entry is None:
+            return self._send_json(404, {"error": "no recorded response matches"})
+
+        response = entry["response"]
+        content = response["content"]
+        chunks = re.findall(r"\s*\S+|\s+$", content) or [content]
+        first_delay, chunk_delay = replay.delays(response, len(chunks))
+
+        def message(content: str, done: bool) -> dict:
+            body = {
+                "model": request.get("model"),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+            }
+            if done:
+                body.update({f: response.get(f) for f in STAT_FIELDS})
+            return body
+
+        time.sleep(first_delay)
+        if not request.get("stream", True):
+            time.sleep(chunk_delay * len(chunks))
+            return self._send_json(200, message(content, done=True))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(body: dict) -> None:
+            data = (json.dumps(body) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(chunk_delay)
+                write(message(chunk, done=False))
+            write(message("", done=True))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the generation
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a cassette as Ollama.")
+    parser.add_argument("cassette")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--speed", type=float, default=None)
+    parser.add_argument("--strict", action="store_true")
+    args = parser.parse_args()
+
+    replay = ReplayServer(
+        args.cassette,
+        latency=args.latency,
+        speed=args.speed,
+        strict=args.strict,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Replaying {len(replay.entries)} responses on {replay.url}")
+    replay.server.serve_forever()
@@ -0,0 +1,169 @@
+import os
+import threading
+from typing import Callable, Optional
+
+from .messages import Message
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+
+# Hugging Face repositories providing the tokenizer of an Ollama model family
+TOKENIZER_REPOSITORIES = {
+    "qwen3": "Qwen/Qwen3-32B",
+    "qwen2.5": "Qwen/Qwen2.5-32B-Instruct",
+    "mistral-nemo": "mistralai/Mistral-Nemo-Instruct-2407",
+    "phi4": "microsoft/phi-4",
+}
+
+# tokens added by the chat template around every message (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# a prompt count this much below the estimate means the server reused its prompt
+# cache for part of the prompt, the count is then no evidence for the calibration
+CALIBRATION_MIN_RATIO = 0.9
+
+# the tokenizer of a counter that was not loaded yet
+_UNLOADED = object()
+
+
+def _load_tokenizer(model_name: str) -> Optional[Callable[[str], int]]:
+    family = model_name.split(":")[0]
+    repository = TOKENIZER_REPOSITORIES.get(family)
+    if Tokenizer is None or repository is None:
+        return None
+
+    try:
+        tokenizer = Tokenizer.from_pretrained(repository)
+    except Exception as e:
+        print(f"[WARNING] Could not load tokenizer '{repository}': {e}")
+        return None
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class TokenCounter:
+    """
+    Counts tokens for one model.
+
+    Uses the model's own tokenizer if the optional `tokenizers` package and a
+    known tokenizer are available. The tokenizer is downloaded from the Hugging
+    Face hub on first use, never when `offline` is set (or HF_HUB_OFFLINE).
+    Otherwise the count is estimated from the number of characters, with the
+    characters-per-token ratio calibrated against the `prompt_eval_count` Ollama
+    reports for requests evaluated without the server's prompt cache.
+
+    Counts are memoized on the Message objects, so long histories are only
+    tokenized once. Also keeps track of the tokens consumed by the model.
+    """
+
+    _counters: dict[str, "TokenCounter"] = {}
+    _counters_lock = threading.Lock()
+
+    # no tokenizer downloads, e.g. for runs served from the caches
+    offline = False
+
+    def __init__(
+        self, model_name: str, tokenizer: Optional[Callable[[str], int]] = None
+    ) -> None:
+        self.model_name = model_name
+        self._tokenizer = tokenizer or _UNLOADED
+        self._tokenizer_lock = threading.Lock()
+        self.chars_per_token = 4.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # tokens sent vs. tokens the server did not have to evaluate (prompt cache)
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def for_model(model_name: str) -> "TokenCounter":
+        with TokenCounter._counters_lock:
+            counters = TokenCounter._counters
+            if model_name not in counters:
+                counters[model_name] = TokenCounter(model_name)
+            return counters[model_name]
+
+    @staticmethod
+    def all() -> list["TokenCounter"]:
+        """The counters of all models used so far."""
+        with TokenCounter._counters_lock:
+            return list(TokenCounter._counters.values())
+
+    @property
+    def tokenizer(self) -> Optional[Callable[[str], int]]:
+        if self._tokenizer is _UNLOADED:
+            # only blocks the users of this model, not the construction of others
+            with self._tokenizer_lock:
+                if self._tokenizer is _UNLOADED:
+                    offline = TokenCounter.offline or os.environ.get("HF_HUB_OFFLINE")
+                    self._tokenizer = (
+                        None if offline else _load_tokenizer(self.model_name)
+                    )
+        return self._tokenizer
+
+    @property
+    def source(self) -> str:
+        return "tokenizer" if self.tokenizer else "estimate"
+
+    def count(self, text: str) -> int:
+        if self.tokenizer:
+            return self.tokenizer(text)
+        return int(len(text) / self.chars_per_token) + 1
+
+    def count_message(self, message: Message) -> int:
+        # estimates change with calibration, tokenizer counts never do
+        version = (
+            hash(message.content),
+            None if self.tokenizer else self.chars_per_token,
+        )
+        cached = message.token_counts.get(self.model_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        count = self.count(message.content) + MESSAGE_OVERHEAD_TOKENS
+        message.token_counts[self.model_name] = (version, count)
+        return count
+
+    def count_messages(self, messages: list[Message]) -> int:
+        return sum(self.count_message(m) for m in messages)
+
+    @property
+    def cached_ratio(self) -> float:
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def record_usage(
+        self,
+        messages: list[Message],
+        prompt_eval_count: Optional[int],
+        eval_count: Optional[int],
+    ) -> float:
+        """Records the counts Ollama reported, returns the share of the prompt served from its cache."""
+        estimate = self.count_messages(messages)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_eval_count or 0
+            self.completion_tokens += eval_count or 0
+            if not prompt_eval_count:
+                return 0.0
+
+            # Ollama only counts the prompt tokens it had to evaluate
+            cached = max(0, estimate - prompt_eval_count)
+            self.input_tokens += estimate
+            self.cached_tokens += cached
+
+            # with a (partial) cache hit the count is too low, calibrating on it
+            # would underestimate every later prompt
+            if self.tokenizer or prompt_eval_count < estimate * CALIBRATION_MIN_RATIO:
+                return cached / estimate
+
+            chars = sum(
+                len(m.content) + MESSAGE_OVERHEAD_TOKENS * self.chars_per_token
+                for m in messages
+            )
+            observed = chars / prompt_eval_count
+            self.chars_per_token = round(0.7 * self.chars_per_token + 0.3 * observed, 2)
+            return cached / estimate
@@ -0,0 +1,165 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from .file_index import FileIndex, FileInfo
+
+
+class CachedContent:
+    """
+    Content of a file at one version, with memoized values derived from it.
+    Large files are memory mapped and only decoded when their text is first
+    needed, the mapping is closed once decoded or when the entry is evicted.
+    """
+
+    def __init__(
+        self,
+        info: FileInfo,
+        text: Optional[str] = None,
+        mapped: Optional[mmap.mmap] = None,
+        path: Optional[str] = None,
+    ) -> None:
+        self.info = info
+        self._text = text
+        self._mapped = mapped
+        # of a mapped file, read again if the entry was evicted before it was decoded
+        self.path = path
+        self._derived: dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def text(self) -> str:
+        with self._lock:
+            if self._text is None and self._mapped is None:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    self._text = file.read()
+            elif self._text is None:
+                self._text = self._mapped[:].decode("utf-8")
+                self.close()
+            return self._text
+
+    @property
+    def size(self) -> int:
+        """Bytes accounted for, the file's size whether mapped or decoded."""
+        return self.info.size
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mapped is not None:
+                self._mapped.close()
+                self._mapped = None
+
+    def derived(self, key: Any, compute: Callable[[str], Any]) -> Any:
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = compute(self.text)
+            return self._derived[key]
+
+    def word_count(self) -> int:
+        return self.derived("words", lambda text: len(text.split()))
+
+    def token_count(self, counter) -> int:
+        # estimates change as the counter calibrates, tokenizer counts do not
+        version = None if counter.tokenizer else counter.chars_per_token
+        return self.derived(("tokens", counter.model_name, version), counter.count)
+
+
+class ContentCache:
+    """
+    Bounded read-through cache of file contents, shared per directory.
+
+    Entries are validated against the FileIndex (size, mtime and hash) on every
+    access and replaced by Storage on write, so a stale version is never served.
+    The least recently used entries are dropped once `max_bytes` (file sizes,
+    mapped or not) are held. Files above `mmap_threshold` bytes are memory
+    mapped; as Storage replaces
+    files instead of rewriting them in place, a mapping stays valid for the
+    version it was created for.
+    """
+
+    _caches: dict[str, "ContentCache"] = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        mmap_threshold: int = 1024 * 1024,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mmap_threshold = mmap_threshold
+        self.entries: OrderedDict[str, CachedContent] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def for_directory(directory: str) -> "ContentCache":
+        key = os.path.abspath(directory)
+        with ContentCache._caches_lock:
+            caches = ContentCache._caches
+            if key not in caches:
+                caches[key] = ContentCache(directory)
+            return caches[key]
+
+    def _load(self, info: FileInfo) -> CachedContent:
+        path = os.path.join(self.directory, info.name)
+        if info.size >= self.mmap_threshold:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            return CachedContent(info, mapped=mapped, path=path)
+        with open(path, "r", encoding="utf-8") as file:
+            return CachedContent(info, text=file.read())
+
+    def get(self, file_name: str) -> Optional[CachedContent]:
+        info = FileIndex.for_directory(self.directory).info(file_name)
+        if info is None:
+            self.invalidate(file_name)
+            return None
+
+        with self._lock:
+            entry = self.entries.get(file_name)
+            if entry is not None and entry.info == info:
+                self.entries.move_to_end(file_name)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        try:
+            entry = self._load(info)
+        except FileNotFoundError:
+            self.invalidate(file_name)
+            return None
+        self._store(entry)
+        return entry
+
+    def put(self, info: FileInfo, content: str) -> None:
+        """Stores content that was just written, so the next read is served from memory."""
+        if info.size >= self.mmap_threshold:
+            self.invalidate(info.name)
+            return
+        self._store(CachedContent(info, text=content))
+
+    def invalidate(self, file_name: str) -> None:
+        with self._lock:
+            entry = self.entries.pop(file_name, None)
+            if entry is not None:
+                self.size -= entry.size
+                entry.close()
+
+    def _store(self, entry: CachedContent) -> None:
+        with self._lock:
+            previous = self.entries.pop(entry.info.name, None)
+            if previous is not None:
+                self.size -= previous.size
+                previous.close()
+            self.entries[entry.info.name] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted.size
+                evicted.close()
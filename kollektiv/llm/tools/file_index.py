@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    name: str
+    size: int
+    mtime_ns: int
+    # sha256 of the content
+    digest: str
+
+
+class FileIndex:
+    """
+    In-process index of the files in a directory with their size, mtime and
+    content hash.
+
+    Files written through Storage are recorded directly. Changes made by
+    others are picked up from the directory's mtime (files added or removed)
+    and the file's own size and mtime (content changed) when they are looked
+    at. Hidden files are not part of the index. Indexes are shared per
+    directory.
+    """
+
+    _indexes: dict[str, "FileIndex"] = {}
+    _indexes_lock = threading.Lock()
+
+    # a directory modified this close to the last scan may still change within
+    # the same mtime tick, it is scanned again on the next access
+    RACY_SECONDS = 1.0
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.files: dict[str, FileInfo] = {}
+        self._directory_mtime_ns: Optional[int] = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def for_directory(directory: str) -> "FileIndex":
+        key = os.path.abspath(directory)
+        with FileIndex._indexes_lock:
+            indexes = FileIndex._indexes
+            if key not in indexes:
+                indexes[key] = FileIndex(directory)
+            return indexes[key]
+
+    @staticmethod
+    def _digest(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _stat(self, name: str, force: bool = False) -> Optional[FileInfo]:
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+            known = self.files.get(name)
+            if (
+                not force
+                and known
+                and known.digest
+                and known.size == stat.st_size
+                and known.mtime_ns == stat.st_mtime_ns
+            ):
+                return known
+            digest = self._digest(path)
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+        return FileInfo(name, stat.st_size, stat.st_mtime_ns, digest)
+
+    def _refresh(self) -> None:
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            self.files, self._directory_mtime_ns = {}, None
+            return
+
+        racy = mtime_ns / 1e9 > self._scanned_at - self.RACY_SECONDS
+        if mtime_ns == self._directory_mtime_ns and not racy:
+            return
+
+        files = {}
+        self._scanned_at = time.time()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                known = self.files.get(entry.name)
+                stat = entry.stat()
+                if (
+                    known
+                    and known.size == stat.st_size
+                    and known.mtime_ns == stat.st_mtime_ns
+                ):
+                    files[entry.name] = known
+                else:
+                    # hashed when it is looked at
+                    files[entry.name] = FileInfo(
+                        entry.name, stat.st_size, stat.st_mtime_ns, ""
+                    )
+        self.files, self._directory_mtime_ns = files, mtime_ns
+
+    def names(self) -> list[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self.files)
+
+    def exists(self, name: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return name in self.files
+
+    def info(self, name: str) -> Optional[FileInfo]:
+        """Current size, mtime and hash of the file, None if it does not exist."""
+        with self._lock:
+            self._refresh()
+            if name not in self.files:
+                return None
+            info = self._stat(name)
+            if info is None:
+                self.files.pop(name, None)
+            else:
+                self.files[name] = info
+            return info
+
+    def record(self, name: str) -> Optional[FileInfo]:
+        """Records a file that was just written."""
+        with self._lock:
+            # the mtime may not have changed within its resolution, always rehash
+            info = self._stat(name, force=True)
+            if info is not None:
+                self.files[name] = info
+            return info
@@ -1,16 +1,93 @@
+import contextlib
+import contextvars
 import os
+import threading
+from typing import Iterator, Optional
 
+from ..handler import local
 from ..messages import ToolMessage
+from ..tokens import TokenCounter
+from .content_cache import CachedContent, ContentCache
+from .file_index import FileIndex, FileInfo
+from .retrieval import RetrievalIndex
 
+# storage root of the current thread or task, see `Storage.rooted`
+_root: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "root", default=None
+)
 
-class Storage:
-    directory: str = "output"
+
+class _StorageMeta(type):
+    @property
+    def directory(cls) -> str:
+        return _root.get() or cls.default_directory
+
+    @directory.setter
+    def directory(cls, directory: str) -> None:
+        cls.default_directory = directory
+
+
+class Storage(metaclass=_StorageMeta):
+    # used unless a root is set with `rooted`
+    default_directory: str = "output"
+
+    @staticmethod
+    @contextlib.contextmanager
+    def rooted(directory: str) -> Iterator[None]:
+        """
+        Makes `directory` the storage root of the code run within the block (in the
+        current thread or task), so that several runs can share a process. Thread
+        pools have to run their work in a copy of the context to inherit it.
+        """
+        token = _root.set(directory)
+        try:
+            yield
+        finally:
+            _root.reset(token)
+
+    @staticmethod
+    def list_files() -> list[str]:
+        return FileIndex.for_directory(Storage.directory).names()
+
+    @staticmethod
+    def exists(file_name: str) -> bool:
+        return FileIndex.for_directory(Storage.directory).exists(file_name)
+
+    @staticmethod
+    def file_info(file_name: str) -> Optional[FileInfo]:
+        """Size, mtime and content hash of a file, to tell whether it changed."""
+        return FileIndex.for_directory(Storage.directory).info(file_name)
 
     @staticmethod
-    def list_files() -> ToolMessage:
-        return os.listdir(Storage.directory)
+    def content(file_name: str) -> Optional[CachedContent]:
+        """Content of a file served from the cache, None if it does not exist."""
+        return ContentCache.for_directory(Storage.directory).get(file_name)
+
+    @staticmethod
+    def store(file_name: str, content: str) -> None:
+        """
+        Writes `content` to `file_name` and updates the indexes and caches. The file
+        is replaced atomically, readers see either the old or the new version.
+        """
+        file_path = os.path.join(Storage.directory, file_name)
+        os.makedirs(Storage.directory, exist_ok=True)
+
+        tmp_path = os.path.join(
+            Storage.directory, f".{file_name}.{threading.get_ident()}.tmp"
+        )
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_path, file_path)
+
+        info = FileIndex.for_directory(Storage.directory).record(file_name)
+        if info is not None:
+            ContentCache.for_directory(Storage.directory).put(info, content)
+        RetrievalIndex.notify(
+            Storage.directory, file_name, content, info.digest if info else None
+        )
 
     @staticmethod
+    @local
     def get_files() -> ToolMessage:
         """
         Retrieves a list of files from the specified storage directory.
@@ -26,6 +103,7 @@ class Storage:
         return ToolMessage(f"Files found:\n{file_list}")
 
     @staticmethod
+    @local
     def read_file(file_name: str) -> ToolMessage:
         """
         Reads the content of a file and returns a ToolMessage object with the file's content.
@@ -36,21 +114,19 @@ class Storage:
                          If successful, the message contains the file's content.
                          If the file is not found, an error message is returned.
         """
-        file_path = os.path.join(Storage.directory, file_name)
-        if not os.path.exists(file_path):
+        content = Storage.content(file_name)
+        if content is None:
             return ToolMessage(f"!! [ERROR]: File '{file_name}' not found.")
 
-        with open(file_path, "r", encoding="utf-8") as file:
-            content = file.read()
-
         return ToolMessage(
             (
                 f"Successfully read file '{file_name}'.\n"
-                f"<content>\n{content}\n</content>"
+                f"<content>\n{content.text}\n</content>"
             )
         )
 
     @staticmethod
+    @local
     def write_file(file_name: str, content: str) -> ToolMessage:
         """
         Writes the given content to a file with the specified name.
@@ -80,15 +156,12 @@ class Storage:
                 )
             )
 
-        file_path = os.path.join(Storage.directory, file_name)
-        os.makedirs(Storage.directory, exist_ok=True)
-
-        with open(file_path, "w", encoding="utf-8") as file:
-            file.write(content)
+        Storage.store(file_name, content)
 
         return ToolMessage(f"Successfully wrote content to file '{file_name}'.")
 
     @staticmethod
+    @local
     def count_words(file_name: str) -> ToolMessage:
         """
         Counts the number of words in a file.
@@ -99,12 +172,71 @@ class Storage:
                          If successful, the message contains the word count.
                          If the file is not found, an error message is returned.
         """
-        file_path = os.path.join(Storage.directory, file_name)
-        if not os.path.exists(file_path):
+        content = Storage.content(file_name)
+        if content is None:
             return ToolMessage(f"!! [ERROR]: File '{file_name}' not found.")
+        word_count = content.word_count()
+
+        return ToolMessage(f"Word count for '{file_name}': {word_count} words.")
 
-        with open(file_path, "r", encoding="utf-8") as file:
-            content = file.read()
-            word_count = len(content.split())
+    @staticmethod
+    @local
+    def search_files(query: str) -> ToolMessage:
+        """
+        Searches all files for the passages most relevant to a query.
+        Args:
+            query (str): Keywords or a question describing the information you are looking for.
+        Returns:
+            ToolMessage: A message containing the best matching passages with the name of the
+                         file they are from. Use read_file to get the full content of a file.
+        """
+        hits = RetrievalIndex.for_directory(Storage.directory).search(query, k=5)
+        hits = [(score, chunk) for score, chunk in hits if score > 0]
+        if not hits:
+            return ToolMessage(f"No passages found for query '{query}'.")
+
+        passages = "\n\n".join(
+            f"<passage file='{chunk.file_name}' position='{chunk.position}'>\n{chunk.text}\n</passage>"
+            for _, chunk in hits
+        )
+        return ToolMessage(f"Passages matching '{query}':\n{passages}")
 
-        return ToolMessage(f"Word count for '{file_name}': {word_count} words.")
\ No newline at end of file
+    @staticmethod
+    def read_relevant(
+        file_names: list[str], query: str, budget: int, counter: TokenCounter
+    ) -> list[ToolMessage]:
+        """
+        Reads the given files, in full if they fit into `budget` tokens (as counted
+        by `counter`) and otherwise as their passages most relevant to `query`.
+        """
+        contents = [Storage.content(file_name) for file_name in file_names]
+        if sum(c.token_count(counter) for c in contents if c) <= budget:
+            return [Storage.read_file(file_name) for file_name in file_names]
+
+        index = RetrievalIndex.for_directory(Storage.directory)
+        selected = {}
+        for _, chunk in index.search(query, file_names):
+            tokens = counter.count(chunk.text)
+            if tokens > budget:
+                continue
+            budget -= tokens
+            selected.setdefault(chunk.file_name, []).append(chunk)
+
+        messages = []
+        for file_name in file_names:
+            if file_name not in index.chunks:
+                messages.append(Storage.read_file(file_name))
+                continue
+            chunks = sorted(selected.get(file_name, []), key=lambda c: c.position)
+            total = len(index.chunks.get(file_name, []))
+            excerpts = "\n\n[...]\n\n".join(c.text for c in chunks)
+            messages.append(
+                ToolMessage(
+                    (
+                        f"Excerpts of file '{file_name}' ({len(chunks)} of {total} passages, "
+                        "use read_file for the full content).\n"
+                        f"<content>\n{excerpts}\n</content>"
+                    )
+                )
+            )
+        return messages
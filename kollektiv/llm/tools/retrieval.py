@@ -0,0 +1,190 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .content_cache import ContentCache
+from .file_index import FileIndex
+
+# files the index can read as text
+TEXT_EXTENSIONS = (".txt", ".md", ".json", ".py")
+
+
+def _terms(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def chunk_text(text: str, max_words: int = 150) -> list[str]:
+    """Splits text at paragraphs into chunks of at most about `max_words` words."""
+    chunks, current, words = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        paragraph_words = paragraph.split()
+        if not paragraph_words:
+            continue
+        if words + len(paragraph_words) > max_words and current:
+            chunks.append("\n\n".join(current))
+            current, words = [], 0
+        # paragraphs longer than a chunk are split on their own
+        while len(paragraph_words) > max_words:
+            chunks.append(" ".join(paragraph_words[:max_words]))
+            paragraph_words = paragraph_words[max_words:]
+            paragraph = " ".join(paragraph_words)
+        current.append(paragraph.strip())
+        words += len(paragraph_words)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+@dataclass
+class Chunk:
+    file_name: str
+    position: int
+    text: str
+    terms: Counter = field(repr=False)
+    length: int = 0
+
+
+class RetrievalIndex:
+    """
+    BM25 index over the text files of a directory, split into paragraph chunks.
+
+    The index is built on first use and kept up to date incrementally by
+    `Storage.write_file`, so only the written file is re-chunked. Files changed
+    on disk by others are re-chunked before a search, when their hash in the
+    FileIndex no longer matches the indexed version. Indexes are shared per
+    directory.
+    """
+
+    _indexes: dict[str, "RetrievalIndex"] = {}
+    _indexes_lock = threading.Lock()
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, directory: str, max_words: int = 150) -> None:
+        self.directory = directory
+        self.max_words = max_words
+        self.chunks: dict[str, list[Chunk]] = {}
+        # hash of the indexed version of each file
+        self.digests: dict[str, Optional[str]] = {}
+        self.document_frequency: Counter = Counter()
+        self.total_length = 0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @staticmethod
+    def for_directory(directory: str) -> "RetrievalIndex":
+        key = os.path.abspath(directory)
+        with RetrievalIndex._indexes_lock:
+            indexes = RetrievalIndex._indexes
+            if key not in indexes:
+                indexes[key] = RetrievalIndex(directory)
+            return indexes[key]
+
+    @staticmethod
+    def notify(
+        directory: str, file_name: str, content: str, digest: Optional[str] = None
+    ) -> None:
+        """Updates the index of `directory`, if one was built already."""
+        with RetrievalIndex._indexes_lock:
+            index = RetrievalIndex._indexes.get(os.path.abspath(directory))
+        if index and file_name.endswith(TEXT_EXTENSIONS):
+            index.update(file_name, content, digest)
+
+    def refresh(self, file_names: Optional[list[str]] = None) -> None:
+        """Re-indexes the files (all by default) whose content changed on disk."""
+        files = FileIndex.for_directory(self.directory)
+        if file_names is None:
+            with self._lock:
+                indexed = list(self.chunks)
+            file_names = sorted(set(files.names()) | set(indexed))
+
+        for file_name in file_names:
+            if not file_name.endswith(TEXT_EXTENSIONS) or file_name.startswith("."):
+                continue
+            info = files.info(file_name)
+            with self._lock:
+                known = file_name in self.chunks
+                current = known and self.digests.get(file_name) == (
+                    info.digest if info else None
+                )
+            if info is None:
+                if known:
+                    self.remove(file_name)
+            elif not current:
+                content = ContentCache.for_directory(self.directory).get(file_name)
+                if content is not None:
+                    self.update(file_name, content.text, content.info.digest)
+
+    def remove(self, file_name: str) -> None:
+        with self._lock:
+            for chunk in self.chunks.pop(file_name, []):
+                self.document_frequency.subtract(chunk.terms.keys())
+                self.total_length -= chunk.length
+            self.digests.pop(file_name, None)
+
+    def update(
+        self, file_name: str, content: str, digest: Optional[str] = None
+    ) -> None:
+        chunks = []
+        for position, text in enumerate(chunk_text(content, self.max_words)):
+            terms = Counter(_terms(text))
+            chunks.append(Chunk(file_name, position, text, terms, sum(terms.values())))
+
+        with self._lock:
+            for chunk in self.chunks.pop(file_name, []):
+                self.document_frequency.subtract(chunk.terms.keys())
+                self.total_length -= chunk.length
+            for chunk in chunks:
+                self.document_frequency.update(chunk.terms.keys())
+                self.total_length += chunk.length
+            self.chunks[file_name] = chunks
+            self.digests[file_name] = digest
+
+    def search(
+        self,
+        query: str,
+        file_names: Optional[list[str]] = None,
+        k: Optional[int] = None,
+    ) -> list[tuple[float, Chunk]]:
+        """Chunks ranked by their BM25 score for `query`, optionally limited to `file_names`."""
+        self.refresh(file_names)
+        terms = set(_terms(query))
+        with self._lock:
+            count = sum(len(c) for c in self.chunks.values())
+            if not count or not terms:
+                return []
+            average_length = max(self.total_length / count, 1)
+            idf = {
+                t: math.log(
+                    1
+                    + (count - self.document_frequency[t] + 0.5)
+                    / (self.document_frequency[t] + 0.5)
+                )
+                for t in terms
+            }
+
+            results = []
+            for file_name, chunks in self.chunks.items():
+                if file_names is not None and file_name not in file_names:
+                    continue
+                for chunk in chunks:
+                    norm = self.K1 * (
+                        1 - self.B + self.B * chunk.length / average_length
+                    )
+                    score = sum(
+                        idf[t]
+                        * chunk.terms[t]
+                        * (self.K1 + 1)
+                        / (chunk.terms[t] + norm)
+                        for t in terms
+                        if t in chunk.terms
+                    )
+                    results.append((score, chunk))
+
+        results.sort(key=lambda r: (-r[0], r[1].file_name, r[1].position))
+        return results[:k] if k else results
@@ -1,11 +1,172 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from duckduckgo_search import DDGS
+import httpx
+import multiprocessing
+import threading
 import trafilatura
+from trafilatura.downloads import DEFAULT_HEADERS
+from trafilatura.settings import DEFAULT_CONFIG
+from trafilatura.utils import decode_file
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
 
+from ..cache import WebCache, normalize_url
 from ..messages import ToolMessage
 
 
+def _extract_text(html: str) -> Optional[str]:
+    # runs in the extraction processes
+    return trafilatura.extract(html)
+
+
 class WebClient:
 
+    # set to a WebCache to persist searches and pages across runs
+    cache: Optional[WebCache] = None
+    max_results = 5
+
+    # page downloads share one connection pool, limited per host
+    max_connections = 16
+    max_per_host = 2
+    timeout = 15.0
+    extract_processes = 4
+    # larger pages are not downloaded (trafilatura's limit)
+    max_bytes = DEFAULT_CONFIG.getint("DEFAULT", "MAX_FILE_SIZE")
+
+    _session: Optional[httpx.Client] = None
+    _extractors: Optional[ProcessPoolExecutor] = None
+    _hosts: dict[str, threading.Semaphore] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_session() -> httpx.Client:
+        with WebClient._lock:
+            if WebClient._session is None:
+                WebClient._session = httpx.Client(
+                    headers=DEFAULT_HEADERS,
+                    timeout=httpx.Timeout(WebClient.timeout, connect=5.0),
+                    limits=httpx.Limits(max_connections=WebClient.max_connections),
+                    follow_redirects=True,
+                )
+            return WebClient._session
+
+    @staticmethod
+    def _get_extractors() -> ProcessPoolExecutor:
+        with WebClient._lock:
+            if WebClient._extractors is None:
+                # spawn, forking a process with running threads may deadlock
+                WebClient._extractors = ProcessPoolExecutor(
+                    max_workers=WebClient.extract_processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return WebClient._extractors
+
+    @staticmethod
+    def _host_slot(url: str) -> threading.Semaphore:
+        host = urlsplit(normalize_url(url)).netloc
+        with WebClient._lock:
+            if host not in WebClient._hosts:
+                WebClient._hosts[host] = threading.Semaphore(WebClient.max_per_host)
+            return WebClient._hosts[host]
+
+    @staticmethod
+    def _search(query: str) -> Optional[list]:
+        cache = WebClient.cache
+        key = cache.search_key(query, WebClient.max_results) if cache else None
+        if cache:
+            results = cache.search.get(key)
+            if results is not None or cache.offline:
+                return results
+
+        ddgs: DDGS = DDGS()
+        results = ddgs.text(keywords=query, max_results=WebClient.max_results)
+        if cache and results:
+            cache.search.put(key, results)
+        return results
+
+    @staticmethod
+    def _fetch(url: str) -> Optional[str]:
+        cache = WebClient.cache
+        if cache:
+            html = cache.html.get(cache.url_key(url))
+            if html is not None or cache.offline:
+                return html
+
+        with WebClient._host_slot(url):
+            with WebClient._get_session().stream("GET", url) as response:
+                if response.status_code >= 400:
+                    return None
+                data = bytearray()
+                # stop reading as soon as the limit is exceeded (decompressed)
+                for chunk in response.iter_bytes():
+                    data += chunk
+                    if len(data) > WebClient.max_bytes:
+                        print(
+                            f"[WARNING] URL '{url}' exceeds {WebClient.max_bytes} bytes, skipping it."
+                        )
+                        return None
+                charset = response.charset_encoding
+        html = WebClient._decode(bytes(data), charset)
+        if cache:
+            cache.html.put(cache.url_key(url), html)
+        return html
+
+    @staticmethod
+    def _decode(data: bytes, charset: Optional[str]) -> str:
+        # the declared charset first, then trafilatura's detection (as fetch_url does)
+        if charset:
+            try:
+                return data.decode(charset)
+            except (LookupError, UnicodeDecodeError):
+                pass
+        return decode_file(data)
+
+    @staticmethod
+    def _cached_text(url: str) -> Optional[str]:
+        cache = WebClient.cache
+        return cache.text.get(cache.url_key(url)) if cache else None
+
+    @staticmethod
+    def _extract(url: str, html: str) -> Future:
+        future = WebClient._get_extractors().submit(_extract_text, html)
+
+        def store(future: Future) -> None:
+            content = None if future.exception() else future.result()
+            if WebClient.cache and content is not None:
+                WebClient.cache.text.put(WebClient.cache.url_key(url), content)
+
+        future.add_done_callback(store)
+        return future
+
+    @staticmethod
+    def _not_downloaded(url: str) -> ToolMessage:
+        if WebClient.cache and WebClient.cache.offline:
+            return ToolMessage(
+                f"!! [WARNING] URL '{url}' is not cached and the web client is offline"
+            )
+        return ToolMessage(f"!! [WARNING] Could not download URL '{url}'")
+
+    @staticmethod
+    def _page(url: str, content: Optional[str], max_words: int) -> ToolMessage:
+        if content is None:
+            return ToolMessage(
+                f"!! [WARNING] trafilatura.extract returned None for downloaded URL '{url}'"
+            )
+
+        words = content.split()
+        if len(words) > max_words:
+            content = " ".join(words[:max_words]) + "... [truncated]"
+
+        return ToolMessage(
+            (f"Page content from '{url}':\n" f"<content>{content}</content>")
+        )
+
     @staticmethod
     def web_search(query: str) -> ToolMessage:
         """
@@ -16,8 +177,11 @@ class WebClient:
             ToolMessage: A message containing the search results in JSON format. If no results
             are found, the content of the message will indicate that no results were found.
         """
-        ddgs: DDGS = DDGS()
-        results = ddgs.text(keywords=query, max_results=5)
+        results = WebClient._search(query)
+        if results is None and WebClient.cache and WebClient.cache.offline:
+            return ToolMessage(
+                f"!! [WARNING] Query '{query}' is not cached and the web client is offline"
+            )
         if not results:
             return ToolMessage(f"!! [WARNING] No results found for query '{query}'")
 
@@ -38,26 +202,70 @@ class WebClient:
                          operation fails, the content will indicate the error encountered.
         """
         try:
-            downloaded = trafilatura.fetch_url(url)
-            if downloaded is None:
-                return ToolMessage(
-                    f"!! [WARNING] trafilatura.fetch_url returned None from URL '{url}'"
-                )
-            content = trafilatura.extract(downloaded)
+            content = WebClient._cached_text(url)
             if content is None:
-                return ToolMessage(
-                    f"!! [WARNING] trafilatura.extract returned None for downloaded URL '{url}'"
-                )
-
-            max_words = 3000
-            words = content.split()
-            if len(words) > max_words:
-                content = " ".join(words[:max_words]) + "... [truncated]"
-
-            return ToolMessage(
-                (f"Page content from '{url}':\n" f"<content>{content}</content>")
-            )
+                downloaded = WebClient._fetch(url)
+                if downloaded is None:
+                    return WebClient._not_downloaded(url)
+                content = WebClient._extract(url, downloaded).result()
+            return WebClient._page(url, content, max_words=3000)
         except Exception as e:
             return ToolMessage(
                 f"!! [ERROR] Exception during processing of URL '{url}': {e}"
             )
+
+    @staticmethod
+    def browse(urls: list[str], max_words: int = 3000) -> Iterator[ToolMessage]:
+        """
+        Fetches several pages concurrently and yields their content in the order
+        they complete. Downloads run on threads, extraction in worker processes.
+        """
+        urls = list({normalize_url(url): url for url in urls}.values())
+        if not urls:
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=min(len(urls), WebClient.max_connections)
+        ) as executor:
+
+            def download(url: str) -> tuple[Optional[str], Optional[str]]:
+                content = WebClient._cached_text(url)
+                return content, None if content is not None else WebClient._fetch(url)
+
+            pending = {executor.submit(download, url): (url, True) for url in urls}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, downloading = pending.pop(future)
+                    try:
+                        if not downloading:
+                            yield WebClient._page(url, future.result(), max_words)
+                            continue
+                        content, downloaded = future.result()
+                        if content is not None:
+                            yield WebClient._page(url, content, max_words)
+                        elif downloaded is None:
+                            yield WebClient._not_downloaded(url)
+                        else:
+                            pending[WebClient._extract(url, downloaded)] = (url, False)
+                    except Exception as e:
+                        yield ToolMessage(
+                            f"!! [ERROR] Exception during processing of URL '{url}': {e}"
+                        )
+
+    @staticmethod
+    def web_browse_many(urls: list[str]) -> ToolMessage:
+        """
+        Fetches and extracts the content of several web pages at once.
+        Args:
+            urls (list[str]): The URLs of the web pages to fetch and extract content from.
+        Returns:
+            ToolMessage: A message object containing the extracted content of all web pages,
+                         with an error message in place of every page that failed.
+        """
+        # keep the combined result within the budget of a few single pages
+        max_words = max(500, 6000 // max(len(urls), 1))
+        pages = [page.content for page in WebClient.browse(urls, max_words)]
+        if not pages:
+            return ToolMessage("!! [WARNING] No URLs given")
+        return ToolMessage("\n\n".join(pages))
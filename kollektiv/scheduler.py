@@ -0,0 +1,139 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from .models.models_phase4_deliverable_tasks import (
+    ProjectWithTasks,
+    ProjectPhaseWithTasks,
+    Task,
+)
+
+
+@dataclass
+class TaskNode:
+    index: int
+    phase: ProjectPhaseWithTasks
+    task: Task
+    depends_on: set[int] = field(default_factory=set)
+    dependents: set[int] = field(default_factory=set)
+
+
+class TaskGraph:
+    """
+    File producer/consumer graph over the tasks of a ProjectWithTasks.
+
+    A task depends on the latest earlier task that produces one of its
+    `required_inputs`. Tasks writing the same file are additionally ordered
+    after the previous writer and after all tasks reading the previous version,
+    so the plan order is preserved wherever two tasks touch the same file.
+    Only earlier tasks are considered, hence the graph is always acyclic.
+    """
+
+    def __init__(self, nodes: List[TaskNode]) -> None:
+        self.nodes = nodes
+
+    @staticmethod
+    def from_plan(plan: ProjectWithTasks) -> "TaskGraph":
+        nodes: List[TaskNode] = []
+        last_writer: dict[str, int] = {}
+        readers: dict[str, list[int]] = {}
+
+        for phase in plan.project_phases:
+            for task in phase.tasks:
+                node = TaskNode(index=len(nodes), phase=phase, task=task)
+
+                for input_file in task.required_inputs:
+                    if input_file in last_writer:
+                        node.depends_on.add(last_writer[input_file])
+                    readers.setdefault(input_file, []).append(node.index)
+
+                output_file = task.deliverable_file.file_name
+                if output_file in last_writer:
+                    node.depends_on.add(last_writer[output_file])
+                node.depends_on.update(
+                    r for r in readers.get(output_file, []) if r != node.index
+                )
+                last_writer[output_file] = node.index
+                readers[output_file] = []
+
+                for dep in node.depends_on:
+                    nodes[dep].dependents.add(node.index)
+                nodes.append(node)
+
+        return TaskGraph(nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def ancestors(self, index: int) -> List[TaskNode]:
+        """All nodes `index` depends on, directly or transitively, in plan order."""
+        seen: set[int] = set()
+        stack = list(self.nodes[index].depends_on)
+        while stack:
+            i = stack.pop()
+            if i not in seen:
+                seen.add(i)
+                stack.extend(self.nodes[i].depends_on)
+        return [self.nodes[i] for i in sorted(seen)]
+
+    def critical_path_length(self) -> int:
+        depth: list[int] = []
+        for node in self.nodes:
+            depth.append(1 + max((depth[d] for d in node.depends_on), default=0))
+        return max(depth, default=0)
+
+
+class TaskScheduler:
+    """
+    Runs the nodes of a TaskGraph on a thread pool as soon as all of their
+    dependencies are completed.
+    """
+
+    def __init__(self, graph: TaskGraph, workers: int = 1) -> None:
+        assert workers >= 1, "At least one worker is required."
+        self.graph = graph
+        self.workers = workers
+
+    def run(
+        self,
+        perform: Callable[[TaskNode], None],
+        on_done: Optional[Callable[[TaskNode], None]] = None,
+    ) -> None:
+        nodes = self.graph.nodes
+        remaining = {n.index: len(n.depends_on) for n in nodes}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running = {}
+
+            def submit_ready(indices):
+                for i in sorted(indices):
+                    if remaining[i] == 0:
+                        # in the context (e.g. storage root) of the caller
+                        future = executor.submit(
+                            contextvars.copy_context().run, perform, nodes[i]
+                        )
+                        running[future] = nodes[i]
+
+            submit_ready(remaining.keys())
+
+            error = None
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+
+                    if on_done:
+                        on_done(node)
+                    if error:
+                        continue
+
+                    for dependent in node.dependents:
+                        remaining[dependent] -= 1
+                    submit_ready(node.dependents)
+
+            if error:
+                raise error
@@ -0,0 +1,351 @@
+"""
+Local HTTP service running goals in one long-lived process.
+
+The modules are imported and the models loaded once, goals are submitted over
+HTTP and run on a worker pool (see BatchRunner), each in its own storage root
+below the output directory:
+
+    python -m kollektiv.service --port 8765 --parallel 2 --workers 4
+
+    POST /goals                  {"goal": "...", "name": "optional"}
+    GET  /goals                  all goals and their progress
+    GET  /goals/<name>           progress of a goal (phase, tasks done)
+    GET  /goals/<name>/events    progress events as NDJSON, streamed until done
+    GET  /goals/<name>/files     files produced so far
+    GET  /goals/<name>/files/<f> a produced file
+    GET  /status                 goals per state, token throughput per model
+    GET  /metrics                request latency and throughput in the Prometheus format
+"""
+
+import argparse
+import collections
+import contextvars
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .batch import BatchRunner
+from .llm import LLMClient, MetricsRecorder, Storage
+from .llm.tokens import TokenCounter
+from .system import FILE_METRICS, MODEL
+
+# no leading dot, "." and ".." would lead out of the goal's own directory
+RE_NAME = re.compile(r"^[\w-][\w.-]*$")
+
+
+@dataclass
+class Job:
+    name: str
+    goal: str
+    state: str = "queued"
+    phase: Optional[str] = None
+    tasks_done: int = 0
+    tasks_total: Optional[int] = None
+    error: Optional[str] = None
+    submitted: float = field(default_factory=time.time)
+    events: list[dict] = field(default_factory=list, repr=False)
+    changed: threading.Condition = field(
+        default_factory=threading.Condition, repr=False
+    )
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("completed", "failed")
+
+    def emit(self, event: str, **details) -> None:
+        """Progress callback of the System running the goal."""
+        with self.changed:
+            if event in ("running", "completed", "failed"):
+                self.state = event
+            if event == "phase":
+                self.phase = details["name"]
+            if event == "task":
+                self.tasks_done, self.tasks_total = details["done"], details["total"]
+            if event == "failed":
+                self.error = details.get("error")
+            self.events.append({"event": event, "time": time.time(), **details})
+            self.changed.notify_all()
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "phase": self.phase,
+            "tasks_done": self.tasks_done,
+            "tasks_total": self.tasks_total,
+            "error": self.error,
+            "submitted": self.submitted,
+        }
+
+
+class Throughput:
+    """Completion tokens per second of each model, over a sliding window."""
+
+    def __init__(self, window: float = 60.0) -> None:
+        self.window = window
+        self._samples: collections.deque = collections.deque()
+        self._lock = threading.Lock()
+
+    def rates(self) -> dict[str, float]:
+        now = time.time()
+        totals = {c.model_name: c.completion_tokens for c in TokenCounter.all()}
+
+        with self._lock:
+            self._samples.append((now, totals))
+            # the oldest sample within the window is the reference
+            while len(self._samples) > 2 and self._samples[1][0] < now - self.window:
+                self._samples.popleft()
+            start, start_totals = self._samples[0]
+
+        seconds = now - start
+        return {
+            model: (
+                round((total - start_totals.get(model, 0)) / seconds, 2)
+                if seconds > 0
+                else 0.0
+            )
+            for model, total in totals.items()
+        }
+
+
+class GoalService:
+    """
+    Accepts goals over HTTP and runs them with a shared BatchRunner. Further
+    `system_options` (workers, host, screening_model, ...) are passed on to
+    every System.
+    """
+
+    # seconds after which an idle event stream reports the throughput
+    HEARTBEAT_SECONDS = 5.0
+
+    def __init__(
+        self,
+        output_directory: str = "output",
+        parallel: int = 2,
+        cache_directory: Optional[str] = None,
+        offline: bool = False,
+        bind: str = "127.0.0.1",
+        port: int = 8765,
+        **system_options,
+    ) -> None:
+        # one trace for all goals, the calls are tagged with their goal
+        self.metrics = MetricsRecorder(os.path.join(output_directory, FILE_METRICS))
+        self.runner = BatchRunner(
+            {},
+            output_directory=output_directory,
+            parallel=parallel,
+            cache_directory=cache_directory,
+            offline=offline,
+            metrics=self.metrics,
+            **system_options,
+        )
+        self.jobs: dict[str, Job] = {}
+        self.throughput = Throughput()
+        self._executor = ThreadPoolExecutor(max_workers=parallel)
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((bind, port), _ServiceRequestHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self) -> None:
+        """Loads the models on the Ollama server(s) before the first goal arrives."""
+        options = self.runner.system_options
+        for model_name in filter(None, [MODEL, options.get("screening_model")]):
+            llm = LLMClient(model_name=model_name, host=options.get("host"))
+            llm.keep_alive = "30m"
+            # sized like the requests of System.run, the screening judge uses a fixed window
+            llm.context_window_dynamic = model_name == MODEL
+            try:
+                llm.warm_up()
+            except Exception as e:
+                print(f"[WARNING] Could not load model '{model_name}': {e}")
+
+    def submit(self, goal: str, name: Optional[str] = None) -> Job:
+        with self._lock:
+            name = name or f"goal_{len(self.jobs) + 1:03d}"
+            if not RE_NAME.fullmatch(name):
+                raise ValueError(f"Invalid name '{name}'.")
+            if name in self.jobs and not self.jobs[name].finished:
+                raise ValueError(f"Goal '{name}' is already queued or running.")
+            job = self.jobs[name] = Job(name, goal)
+            self.runner.goals[name] = goal
+
+        self._executor.submit(contextvars.copy_context().run, self._run, job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        job.emit("running")
+        try:
+            self.runner.run_goal(job.name, on_progress=job.emit)
+        except Exception as e:
+            print(f"[WARNING] Goal '{job.name}' failed: {e}")
+            job.emit("failed", error=str(e))
+
+    def job(self, name: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(name)
+
+    def all_jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def files(self, job: Job) -> list[str]:
+        with Storage.rooted(self.runner.directory(job.name)):
+            return Storage.list_files()
+
+    def status(self) -> dict:
+        with self._lock:
+            states = collections.Counter(j.state for j in self.jobs.values())
+        return {
+            "goals": dict(states),
+            "tokens_per_second": self.throughput.rates(),
+        }
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ServiceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    @property
+    def service(self) -> GoalService:
+        return self.server.service
+
+    def _send(self, status: int, data: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, body) -> None:
+        self._send(status, json.dumps(body).encode("utf-8"), "application/json")
+
+    def do_POST(self) -> None:
+        if self.path != "/goals":
+            return self._send_json(404, {"error": f"unknown path '{self.path}'"})
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body.get("goal"), str) or not body["goal"].strip():
+                raise ValueError("A goal is required.")
+            job = self.service.submit(body["goal"].strip(), body.get("name"))
+        except (ValueError, AttributeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job.to_dict())
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        if parts == ["status"]:
+            return self._send_json(200, self.service.status())
+        if parts == ["metrics"]:
+            data = self.service.metrics.prometheus().encode("utf-8")
+            return self._send(200, data, "text/plain; version=0.0.4")
+        if parts == ["goals"]:
+            jobs = self.service.all_jobs()
+            return self._send_json(200, [j.to_dict() for j in jobs])
+        job = self.service.job(parts[1]) if len(parts) > 1 else None
+        if parts[0] != "goals" or job is None:
+            return self._send_json(404, {"error": f"unknown path '{self.path}'"})
+
+        if len(parts) == 2:
+            return self._send_json(200, job.to_dict())
+        if parts[2:] == ["events"]:
+            return self._stream_events(job)
+        if parts[2:] == ["files"]:
+            return self._send_json(200, self.service.files(job))
+        if len(parts) == 4 and parts[2] == "files":
+            return self._send_file(job, parts[3])
+        self._send_json(404, {"error": f"unknown path '{self.path}'"})
+
+    def _send_file(self, job: Job, file_name: str) -> None:
+        # only listed files, the name must not lead out of the storage root
+        if file_name not in self.service.files(job):
+            return self._send_json(404, {"error": f"File '{file_name}' not found."})
+        path = os.path.join(self.service.runner.directory(job.name), file_name)
+        with open(path, "rb") as file:
+            data = file.read()
+        content_type = mimetypes.guess_type(file_name)[0] or "text/plain"
+        self._send(200, data, content_type)
+
+    def _stream_events(self, job: Job) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(body: dict) -> None:
+            data = (json.dumps(body) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        sent = 0
+        try:
+            while True:
+                with job.changed:
+                    if sent == len(job.events) and not job.finished:
+                        job.changed.wait(timeout=self.service.HEARTBEAT_SECONDS)
+                    events, finished = job.events[sent:], job.finished
+                sent += len(events)
+                for event in events:
+                    write(event)
+                if finished and not events:
+                    break
+                if not events:
+                    rates = self.service.throughput.rates()
+                    write({"event": "throughput", "tokens_per_second": rates})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client stopped listening
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve goal runs over HTTP.")
+    parser.add_argument("--bind", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="output")
+    parser.add_argument("--parallel", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cache", default=None)
+    parser.add_argument("--offline", action="store_true")
+    parser.add_argument("--host", action="append", default=None)
+    parser.add_argument("--screening-model", default=None)
+    args = parser.parse_args()
+
+    service = GoalService(
+        output_directory=args.output,
+        parallel=args.parallel,
+        cache_directory=args.cache,
+        offline=args.offline,
+        bind=args.bind,
+        port=args.port,
+        workers=args.workers,
+        host=args.host,
+        screening_model=args.screening_model,
+    )
+    service.warm_up()
+    print(f"Serving goals on {service.url}")
+    service.serve_forever()
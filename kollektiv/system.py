@@ -1,15 +1,29 @@
+import contextlib
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
+from typing import Callable, Iterator, Optional, Union
 
-from .llm import LLMClient, Message, UserMessage, SystemMessage
+from .llm import LLMClient, DiskCache, ResponseCache, WebCache, Cassette, RunJournal
+from .llm import MetricsRecorder
+from .llm import Message, UserMessage, SystemMessage, HistoryCompactor
 from .llm import Judge, EvaluationResult
 from .llm import WebClient, Storage
+from .llm.tokens import TokenCounter
 
 from .utils import save_pydantic_json, load_pydantic_json, generate_project_plan_graph
 
 from .models.models_phase2_phases import Project
 from .models.models_phase3_deliverables import ProjectWithDeliverables
-from .models.models_phase4_deliverable_tasks import ProjectWithTasks, TaskList
+from .models.models_phase4_deliverable_tasks import (
+    ProjectWithTasks,
+    ProjectPhaseWithTasks,
+    Task,
+    TaskList,
+)
 from .models.models_phase5_perform import ResultEvaluation
+from .scheduler import TaskGraph, TaskNode, TaskScheduler
 
 
 ASSISTANT_PRIMING = (
@@ -27,18 +41,92 @@ ASSISTANT_PRIMING = (
     "You will be guided in the sense that the System will tell you which tool to use and when."
 )
 
+# model doing the work and judging it
+MODEL = "qwen3:32b"
+
 FILE_RESEARCH = "research.txt"
 FILE_PROJECT_STRUCTURE = "project_structure.json"
 FILE_PROJECT_PLAN = "project_plan.json"
 FILE_PROJECT_PLAN_WITH_TASKS = "project_plan_with_tasks.json"
+# hidden, so the agents do not see it among their files
+FILE_JOURNAL = ".journal.jsonl"
+FILE_METRICS = ".metrics.jsonl"
+
+# tokens the required inputs of a task may take before only excerpts are included
+INPUT_BUDGET_TOKENS = 8000
 
 
 class System:
 
-    def __init__(self, goal: str):
+    def __init__(
+        self,
+        goal: str,
+        workers: int = 1,
+        cache_directory: Optional[str] = None,
+        seed: Optional[int] = None,
+        host: Optional[Union[str, list[str]]] = None,
+        cassette_path: Optional[str] = None,
+        offline: bool = False,
+        screening_model: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        metrics: Optional[MetricsRecorder] = None,
+    ):
         self.goal = goal
-        self.llm = LLMClient(model_name="qwen3:32b")
-        self.judge = Judge(LLMClient(model_name="qwen3:32b"))
+        self.workers = workers
+        # `cache` is an already opened response cache, e.g. shared by a batch of runs
+        if cache_directory:
+            cache = ResponseCache(os.path.join(cache_directory, "responses"))
+            WebClient.cache = WebCache(
+                os.path.join(cache_directory, "web"), offline=offline
+            )
+        elif offline:
+            raise ValueError("Offline mode requires a cache_directory.")
+        if offline:
+            TokenCounter.offline = True
+        self.llm = LLMClient(model_name=MODEL, host=host, cache=cache, seed=seed)
+        screen = None
+        if screening_model:
+            screen = Judge(
+                LLMClient(
+                    model_name=screening_model, host=host, cache=cache, seed=seed
+                ),
+                per_criterion=True,
+            )
+        self.judge = Judge(
+            LLMClient(model_name=MODEL, host=host, cache=cache, seed=seed),
+            per_criterion=True,
+            screen=screen,
+        )
+        # keep the model and its prompt cache loaded in between the phases
+        for llm in [self.llm, self.judge.llm] + ([screen.llm] if screen else []):
+            llm.keep_alive = "30m"
+        # everything paid for is journaled, an interrupted run resumes from there
+        self.journal = RunJournal(os.path.join(Storage.directory, FILE_JOURNAL))
+        # latency and throughput of every request, `metrics` may be shared by a batch of runs
+        self.metrics = metrics or MetricsRecorder(
+            os.path.join(Storage.directory, FILE_METRICS)
+        )
+        for llm in [self.llm, self.judge.llm] + ([screen.llm] if screen else []):
+            llm.journal = self.journal
+            llm.metrics = self.metrics
+        if cassette_path:
+            cassette = Cassette(cassette_path)
+            self.llm.cassette = self.judge.llm.cassette = cassette
+            if screen:
+                screen.llm.cassette = cassette
+        # called with an event name and its details as the run progresses
+        self.on_progress: Optional[Callable[..., None]] = None
+
+    def _progress(self, event: str, **details) -> None:
+        if self.on_progress:
+            self.on_progress(event, **details)
+
+    @contextlib.contextmanager
+    def _phase(self, phase: int, name: str) -> Iterator[None]:
+        self._progress("phase", phase=phase, name=name)
+        # phase 5 consists of task steps, see `_task_step`
+        with MetricsRecorder.tagged(phase=name), RunJournal.step(f"phase{phase}"):
+            yield
 
     def run(self):
         debug = False
@@ -50,46 +138,110 @@ class System:
             UserMessage(f"This is my goal:\n{self.goal}").print(not debug),
         ]
 
-        self.run_phase1_research(debug, history_base)
-        self.run_phase2_phases(debug, history_base)
-        self.run_phase3_deliverables(debug, history_base)
-        self.run_phase4_tasks(debug, history_base)
-        self.generate_phase4_graph()
-        self.run_phase5_perform(debug, history_base)
+        with self._phase(1, "research"):
+            self.run_phase1_research(debug, history_base)
+        with self._phase(2, "phases"):
+            self.run_phase2_phases(debug, history_base)
+        with self._phase(3, "deliverables"):
+            self.run_phase3_deliverables(debug, history_base)
+        with self._phase(4, "tasks"):
+            self.run_phase4_tasks(debug, history_base)
+            self.generate_phase4_graph()
+        with self._phase(5, "perform"):
+            self.run_phase5_perform(debug, history_base)
+        self._progress("completed")
+
+    @staticmethod
+    def _digests(file_names: list[str]) -> dict[str, Optional[str]]:
+        infos = {f: Storage.file_info(f) for f in sorted(file_names)}
+        return {f: info.digest if info else None for f, info in infos.items()}
+
+    def _fingerprint(self, *parts) -> str:
+        # everything besides the input files that determines the outcome of a step
+        return DiskCache.make_key(
+            self.llm.model_name, ASSISTANT_PRIMING, self.goal, *parts
+        )
+
+    def _up_to_date(
+        self, step: str, output: str, inputs: dict[str, Optional[str]], fingerprint: str
+    ) -> bool:
+        """
+        Whether `step` can be skipped, like make does: it was completed before, its
+        output still exists and neither its input files nor its prompt changed
+        since. An edited output is kept, the steps using it are out of date then.
+        """
+        record = self.journal.completed(step)
+        if record is None:
+            # output of a run from before the journal was kept
+            return not self.journal.resumed and Storage.exists(output)
+
+        if not all(Storage.exists(f) for f in record["files"]):
+            reason = "its output is missing"
+        elif record.get("fingerprint") != fingerprint:
+            reason = "its prompt changed"
+        elif record.get("inputs") != inputs:
+            recorded = record.get("inputs") or {}
+            changed = sorted(
+                f
+                for f in set(inputs) | set(recorded)
+                if inputs.get(f) != recorded.get(f)
+            )
+            reason = f"its inputs changed ({', '.join(changed)})"
+        else:
+            return True
+        print(f"[DEBUG] Step '{step}' is out of date, {reason}.")
+        return False
+
+    def _complete(
+        self, step: str, output: str, inputs: dict[str, Optional[str]], fingerprint: str
+    ) -> None:
+        self.journal.complete(step, self._digests([output]), inputs, fingerprint)
 
     def run_phase1_research(self, debug, history):
-        if FILE_RESEARCH in Storage.list_files():
+        message = (
+            "Your task in this step is to figure out in principle how one tackles a project like this.\n"
+            "You will be guided through the following steps:\n"
+            "1. Search for helpful resources on how to break the problem down into phases.\n"
+            "2. Browse the most promising of those resources at once to get in-depth and diverse information.\n"
+            "3. Finally, respond with your reflections and the overall summary. "
+            "Include all information that you think is relevant to the project. "
+            "Assume the person executing the task might not have the tools available to research on their own.\n"
+            "IMPORTANT: Focus on the 'how to structure' part, and not on specific details already.\n"
+            "Also note, you MUST use the tool provided!"
+        )
+        inputs, fingerprint = {}, self._fingerprint(message)
+        if self._up_to_date("phase1", FILE_RESEARCH, inputs, fingerprint):
             print(
-                f"[DEBUG 1] File {FILE_RESEARCH} already exists. Skipping research phase."
+                f"[DEBUG 1] File {FILE_RESEARCH} is up to date. Skipping research phase."
             )
             return
 
         response, _ = self.llm.chat(
-            message=(
-                "Your task in this step is to figure out in principle how one tackles a project like this.\n"
-                "You will be guided through the following steps:\n"
-                "1. Search for helpful resources on how to break the problem down into phases.\n"
-                "2. Browse one of those resources to get in-depth information.\n"
-                "3. Browse a second of those resources to diversify the information.\n"
-                "4. Finally, respond with your reflections and the overall summary. "
-                "Include all information that you think is relevant to the project. "
-                "Assume the person executing the task might not have the tools available to research on their own.\n"
-                "IMPORTANT: Focus on the 'how to structure' part, and not on specific details already.\n"
-                "Also note, you MUST use the tool provided!"
-            ),
+            message=message,
             history=history,
             tools=[
                 WebClient.web_search,
-                WebClient.web_browse,
+                WebClient.web_browse_many,
             ],
             tools_forced_sequence=True,
         )
         Storage.write_file(FILE_RESEARCH, response.strip())
+        self._complete("phase1", FILE_RESEARCH, inputs, fingerprint)
 
     def run_phase2_phases(self, debug, history):
-        if FILE_PROJECT_STRUCTURE in Storage.list_files():
+        message = (
+            "In the previous step you successfully figured out in principle how one tackles a project like this.\n"
+            "Your task now is to do the following:\n"
+            "1. Reflect on what suitable project phases are to achieve the goal.\n"
+            "2. Finally, respond in the requested format and create the Project hierarchy."
+        )
+        inputs = self._digests([FILE_RESEARCH])
+        fingerprint = self._fingerprint(
+            message, Project.model_json_schema(), self.judge.llm.model_name
+        )
+        if self._up_to_date("phase2", FILE_PROJECT_STRUCTURE, inputs, fingerprint):
             print(
-                f"[DEBUG 2] File {FILE_PROJECT_STRUCTURE} already exists. Skipping project structure phase."
+                f"[DEBUG 2] File {FILE_PROJECT_STRUCTURE} is up to date. Skipping project structure phase."
             )
             return
 
@@ -97,23 +249,43 @@ class System:
         history.append(Storage.read_file(FILE_RESEARCH).print(not debug))
 
         project, history = self.llm.chat_reflect_improve(
-            message=(
-                "In the previous step you successfully figured out in principle how one tackles a project like this.\n"
-                "Your task now is to do the following:\n"
-                "1. Reflect on what suitable project phases are to achieve the goal.\n"
-                "2. Finally, respond in the requested format and create the Project hierarchy."
-            ),
+            message=message,
             history=history,
             format=Project,
             judge=self.judge,
         )
 
         save_pydantic_json(project, FILE_PROJECT_STRUCTURE)
+        self._complete("phase2", FILE_PROJECT_STRUCTURE, inputs, fingerprint)
 
     def run_phase3_deliverables(self, debug, history):
-        if FILE_PROJECT_PLAN in Storage.list_files():
+        message = (
+            "In the previous step you successfully created a project structure with phases of how to tackle the project.\n"
+            "\n"
+            "Your task now is to do the following:\n"
+            "1. Think through each phase and note down the following:\n"
+            "   - What files are expected to be produced as part of this phase?\n"
+            "   - What files are required as input for this phase?\n"
+            "2. Finally, respond in the requested format and create the ProjectPlan.\n"
+            "\n"
+            "Note: The already existing files (research.txt, project_structure.json) are also valid input files "
+            "and must also be considered as input files if required.\n"
+            "\n"
+            "IMPORTANT: Choose the file names carefully. "
+            "The file names should be descriptive and indicate the content of the file. Avoid re-using file names. "
+            "For example, if in the first phase you create a file called `foo.txt`, "
+            "do not use the same name in the second phase to modify or overwrite its contents, "
+            "rather consider a suffix like `foo_draft.txt`, `foo_edited.txt`, or `foo_final.txt` etc."
+        )
+        inputs = self._digests([FILE_RESEARCH, FILE_PROJECT_STRUCTURE])
+        fingerprint = self._fingerprint(
+            message,
+            ProjectWithDeliverables.model_json_schema(),
+            self.judge.llm.model_name,
+        )
+        if self._up_to_date("phase3", FILE_PROJECT_PLAN, inputs, fingerprint):
             print(
-                f"[DEBUG 3] File {FILE_PROJECT_PLAN} already exists. Skipping project plan phase."
+                f"[DEBUG 3] File {FILE_PROJECT_PLAN} is up to date. Skipping project plan phase."
             )
             return
 
@@ -126,34 +298,55 @@ class System:
         )
 
         plan, _ = self.llm.chat_reflect_improve(
-            message=(
-                "In the previous step you successfully created a project structure with phases of how to tackle the project.\n"
-                "\n"
-                "Your task now is to do the following:\n"
-                "1. Think through each phase and note down the following:\n"
-                "   - What files are expected to be produced as part of this phase?\n"
-                "   - What files are required as input for this phase?\n"
-                "2. Finally, respond in the requested format and create the ProjectPlan.\n"
-                "\n"
-                "Note: The already existing files (research.txt, project_structure.json) are also valid input files "
-                "and must also be considered as input files if required.\n"
-                "\n"
-                "IMPORTANT: Choose the file names carefully. "
-                "The file names should be descriptive and indicate the content of the file. Avoid re-using file names. "
-                "For example, if in the first phase you create a file called `foo.txt`, "
-                "do not use the same name in the second phase to modify or overwrite its contents, "
-                "rather consider a suffix like `foo_draft.txt`, `foo_edited.txt`, or `foo_final.txt` etc."
-            ),
+            message=message,
             history=history,
             format=ProjectWithDeliverables,
             judge=self.judge,
         )
         save_pydantic_json(plan, FILE_PROJECT_PLAN)
+        self._complete("phase3", FILE_PROJECT_PLAN, inputs, fingerprint)
+
+    @staticmethod
+    def _decomposition_message(phase: ProjectPhaseWithTasks) -> str:
+        return (
+            f"In the previous steps you successfully created a project plan with phases and deliverables.\n"
+            f"We will go through each phase individually now upon my instruction to analyze the todos.\n"
+            "\n"
+            f"For this iteration, you are working on the phase '{phase.phase_name}'.\n"
+            f"```json\n{phase.model_dump_json(indent=2)}\n```\n"
+            "\n"
+            f"Your task now is to do the following:\n"
+            f"1. Think about what steps need to be performed to complete the phase '{phase.phase_name}'.\n"
+            f"2. Given the available input files of this phase overall, which of these files are required for the individual steps?\n"
+            f"3. Given the expected output files of this phase overall, which of these files are produced by the individual steps?\n"
+            f"4. Finally, respond in the requested format to populate the TaskList.\n"
+            "\n"
+            "Note: The agent performing these tasks are stateless, if you a step produces information that is required for a later step, "
+            "you need to include this information in the output of the step by writing it to that file.\n"
+            "Only files that are an expected deliverable of this phase can be produced in this phase. "
+            "However, the goal is to create atomic actions that are as small as possible, "
+            "therefore you may produce intermediate files that are not part of the expected deliverables. "
+            "These intermediate files are only required for the next step and will be deleted after the phase is over. "
+            "For example, you may create a TMP_foo_draft.txt file that is only required for the next step to produce the final foo.txt file.\n"
+            "Split the tasks into such small atomic actions that each task produces exactly one file. "
+            "Each task may have multiple required input files though.\n"
+            "\n"
+            "IMPORTANT: Before you respond, verify that: The tasks include all required input files, otherwise the information is not available and overall coherence is lost."
+        )
 
     def run_phase4_tasks(self, debug, history):
-        if FILE_PROJECT_PLAN_WITH_TASKS in Storage.list_files():
+        plan = load_pydantic_json(FILE_PROJECT_PLAN, ProjectWithDeliverables)
+        plan = ProjectWithTasks.from_plan(plan)
+        messages = [self._decomposition_message(p) for p in plan.project_phases]
+        inputs = self._digests([FILE_RESEARCH, FILE_PROJECT_PLAN])
+        fingerprint = self._fingerprint(
+            messages, TaskList.model_json_schema(), self.judge.llm.model_name
+        )
+        if self._up_to_date(
+            "phase4", FILE_PROJECT_PLAN_WITH_TASKS, inputs, fingerprint
+        ):
             print(
-                f"[DEBUG 4] File {FILE_PROJECT_PLAN_WITH_TASKS} already exists. Skipping project plan with tasks phase."
+                f"[DEBUG 4] File {FILE_PROJECT_PLAN_WITH_TASKS} is up to date. Skipping project plan with tasks phase."
             )
             return
 
@@ -165,58 +358,58 @@ class System:
             ]
         )
 
-        plan = load_pydantic_json(FILE_PROJECT_PLAN, ProjectWithDeliverables)
-        plan = ProjectWithTasks.from_plan(plan)
-        for phase in plan.project_phases:
-            taskListM, _ = self.llm.chat_reflect_improve(
-                message=(
-                    f"In the previous steps you successfully created a project plan with phases and deliverables.\n"
-                    f"We will go through each phase individually now upon my instruction to analyze the todos.\n"
-                    "\n"
-                    f"For this iteration, you are working on the phase '{phase.phase_name}'.\n"
-                    f"```json\n{phase.model_dump_json(indent=2)}\n```\n"
-                    "\n"
-                    f"Your task now is to do the following:\n"
-                    f"1. Think about what steps need to be performed to complete the phase '{phase.phase_name}'.\n"
-                    f"2. Given the available input files of this phase overall, which of these files are required for the individual steps?\n"
-                    f"3. Given the expected output files of this phase overall, which of these files are produced by the individual steps?\n"
-                    f"4. Finally, respond in the requested format to populate the TaskList.\n"
-                    "\n"
-                    "Note: The agent performing these tasks are stateless, if you a step produces information that is required for a later step, "
-                    "you need to include this information in the output of the step by writing it to that file.\n"
-                    "Only files that are an expected deliverable of this phase can be produced in this phase. "
-                    "However, the goal is to create atomic actions that are as small as possible, "
-                    "therefore you may produce intermediate files that are not part of the expected deliverables. "
-                    "These intermediate files are only required for the next step and will be deleted after the phase is over. "
-                    "For example, you may create a TMP_foo_draft.txt file that is only required for the next step to produce the final foo.txt file.\n"
-                    "Split the tasks into such small atomic actions that each task produces exactly one file. "
-                    "Each task may have multiple required input files though.\n"
-                    "\n"
-                    "IMPORTANT: Before you respond, verify that: The tasks include all required input files, otherwise the information is not available and overall coherence is lost."
-                ),
-                history=history,
-                format=TaskList,
-                judge=self.judge,
-            )
-            phase.tasks = taskListM.tasks
-            save_pydantic_json(plan, FILE_PROJECT_PLAN_WITH_TASKS)
+        # interleaved streaming output of concurrent phases is unreadable
+        verbose = not debug and self.workers == 1
+
+        def decompose(phase: ProjectPhaseWithTasks, message: str) -> TaskList:
+            # keeps the refinement rounds of a phase on one host (and its prompt cache)
+            with LLMClient.pinned(f"phase4/{phase.phase_name}"), MetricsRecorder.tagged(
+                task=phase.phase_name
+            ):
+                taskListM, _ = self.llm.chat_reflect_improve(
+                    message=message,
+                    history=history,
+                    format=TaskList,
+                    judge=self.judge,
+                    verbose=verbose,
+                )
+            return taskListM
+
+        # the phases only share the history, they are decomposed concurrently
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, decompose, phase, message
+                ): phase
+                for phase, message in zip(plan.project_phases, messages)
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Phase"):
+                phase = futures[future]
+                phase.tasks = future.result().tasks
+                self._progress(
+                    "decomposed", phase=phase.phase_name, tasks=len(phase.tasks)
+                )
+                # checkpoint, the phases decomposed so far
+                save_pydantic_json(plan, FILE_PROJECT_PLAN_WITH_TASKS)
+        self._complete("phase4", FILE_PROJECT_PLAN_WITH_TASKS, inputs, fingerprint)
 
     def generate_phase4_graph(self):
         output_filename = FILE_PROJECT_PLAN_WITH_TASKS + ".png"
-        if output_filename in Storage.list_files():
+        inputs = self._digests([FILE_PROJECT_PLAN_WITH_TASKS])
+        fingerprint = self._fingerprint("graph")
+        if self._up_to_date("graph", output_filename, inputs, fingerprint):
             print(
-                f"[DEBUG 4] File {output_filename} already exists. Skipping graph generation."
+                f"[DEBUG 4] File {output_filename} is up to date. Skipping graph generation."
             )
             return
 
-        import os
-
         generate_project_plan_graph(
             json_file_path=os.path.join(
                 Storage.directory, FILE_PROJECT_PLAN_WITH_TASKS
             ),
             output_png_path=os.path.join(Storage.directory, output_filename),
         )
+        self._complete("graph", output_filename, inputs, fingerprint)
 
     def run_phase5_perform(self, debug, history: list[Message]):
         plan: ProjectWithTasks = load_pydantic_json(
@@ -226,87 +419,155 @@ class System:
         history = history.copy()
         history.append(Storage.read_file(FILE_PROJECT_PLAN).print(not debug))
 
-        tasks_completed = []
-        for phase in tqdm(plan.project_phases, desc="Phase"):
-            for task in tqdm(phase.tasks, desc=f"Task in phase '{phase.phase_name}'"):
-                # for recovery
-                files = Storage.list_files()
-                if task.deliverable_file.file_name in files:
-                    tasks_completed.append(task)
-                    print(
-                        f"[DEBUG 5] File {task.deliverable_file.file_name} already exists. Skipping task '{task.task_name}'."
-                    )
-                    continue
-
-                history_ = history.copy()
-                if tasks_completed:
-                    texts = "\n".join(
-                        [
-                            f"- ✓ {t.task_name} ({t.deliverable_file.file_name})"
-                            for t in tasks_completed
-                        ]
-                    )
-                    history_.append(
-                        SystemMessage(
-                            f"You previously completed the following tasks:\n{texts}"
-                        ).print(not debug)
-                    )
+        graph = TaskGraph.from_plan(plan)
+        print(
+            f"[DEBUG 5] Scheduling {len(graph)} tasks on {self.workers} worker(s), "
+            f"critical path length: {graph.critical_path_length()}"
+        )
 
-                if task.required_inputs:
-                    history_.append(
-                        SystemMessage(
-                            "You will require the following files for your next task:"
-                        ).print(not debug)
-                    )
-                    for input_file in task.required_inputs:
-                        history_.append(Storage.read_file(input_file).print(not debug))
-
-                while True:
-                    resultEvalM, history_ = self.llm.chat(
-                        message=(
-                            "You are currently in the phase:\n"
-                            f"- Phase Name: {phase.phase_name}\n"
-                            f"- Phase Description: {phase.description}\n"
-                            "\n"
-                            "You are currently working on the task:\n"
-                            f"- Task Name: {task.task_name}\n"
-                            f"- Task Description: {task.description}\n"
-                            "\n"
-                            "You are required to produce the following file:\n"
-                            f"- Deliverable File Name: {task.deliverable_file.file_name}\n"
-                            f"- Deliverable File Description: {task.deliverable_file.description}\n"
-                            "\n"
-                            "Your task now is to:\n"
-                            f"1. Think about what information must be included in the file '{task.deliverable_file.file_name}'.\n"
-                            f"2. Write the content of the file '{task.deliverable_file.file_name}' in the requested format using the tool API.\n"
-                            f"3. Judge whether you need to overwrite your output or if you want to continue with the next task.\n"
-                            "\n"
-                            "Note: On rare occasions, if you deem it necessary, you may also overwrite the content of an existing file. "
-                            "However, this should be avoided if possible and is only a valid strategy if new insights came to light "
-                            "that could not have been anticipated before and require a retroactive change of certain project artifacts "
-                            "to guarantee overall coherence, completeness, correctness, consistency and compatibility.\n"
-                            "The system will only move to the next task once the requested file is produced. "
-                        ),
-                        history=history_,
-                        tools=[
-                            Storage.read_file,
-                            Storage.write_file,
-                            Storage.count_words,
-                        ],
-                        format=ResultEvaluation,
+        def perform(node: TaskNode):
+            # only the tasks this one builds on, in plan order: independent of
+            # which concurrent tasks happen to finish first, so the prompt is
+            # the same on every run (and matches the journal and cache)
+            completed = [n.task for n in graph.ancestors(node.index)]
+            # keeps the turns of a task on one host (and its prompt cache)
+            file_name = node.task.deliverable_file.file_name
+            step = self._task_step(node.phase, node.task)
+            with LLMClient.pinned(file_name), RunJournal.step(step):
+                with MetricsRecorder.tagged(task=file_name):
+                    self.perform_task(debug, history, node.phase, node.task, completed)
+
+        # called by the scheduler one node at a time
+        def on_done(node: TaskNode):
+            progress.update(1)
+            self._progress(
+                "task",
+                name=node.task.task_name,
+                file=node.task.deliverable_file.file_name,
+                done=progress.n,
+                total=len(graph),
+            )
+
+        with tqdm(total=len(graph), desc="Task") as progress:
+            TaskScheduler(graph, workers=self.workers).run(perform, on_done)
+
+    @staticmethod
+    def _task_message(phase: ProjectPhaseWithTasks, task: Task) -> str:
+        return (
+            "You are currently in the phase:\n"
+            f"- Phase Name: {phase.phase_name}\n"
+            f"- Phase Description: {phase.description}\n"
+            "\n"
+            "You are currently working on the task:\n"
+            f"- Task Name: {task.task_name}\n"
+            f"- Task Description: {task.description}\n"
+            "\n"
+            "You are required to produce the following file:\n"
+            f"- Deliverable File Name: {task.deliverable_file.file_name}\n"
+            f"- Deliverable File Description: {task.deliverable_file.description}\n"
+            "\n"
+            "Your task now is to:\n"
+            f"1. Think about what information must be included in the file '{task.deliverable_file.file_name}'.\n"
+            f"2. Write the content of the file '{task.deliverable_file.file_name}' in the requested format using the tool API.\n"
+            f"3. Judge whether you need to overwrite your output or if you want to continue with the next task.\n"
+            "\n"
+            "Note: On rare occasions, if you deem it necessary, you may also overwrite the content of an existing file. "
+            "However, this should be avoided if possible and is only a valid strategy if new insights came to light "
+            "that could not have been anticipated before and require a retroactive change of certain project artifacts "
+            "to guarantee overall coherence, completeness, correctness, consistency and compatibility.\n"
+            "The system will only move to the next task once the requested file is produced. "
+        )
+
+    @staticmethod
+    def _task_step(phase: ProjectPhaseWithTasks, task: Task) -> str:
+        # for recovery and incremental re-runs
+        return f"task:{phase.phase_name}/{task.task_name}"
+
+    def perform_task(
+        self,
+        debug,
+        history: list[Message],
+        phase: ProjectPhaseWithTasks,
+        task: Task,
+        tasks_completed: list[Task],
+    ):
+        step = self._task_step(phase, task)
+        message = self._task_message(phase, task)
+        # the plan is part of the history of every task
+        inputs = self._digests(task.required_inputs + [FILE_PROJECT_PLAN])
+        fingerprint = self._fingerprint(message, ResultEvaluation.model_json_schema())
+        if self._up_to_date(step, task.deliverable_file.file_name, inputs, fingerprint):
+            print(
+                f"[DEBUG 5] File {task.deliverable_file.file_name} is up to date. Skipping task '{task.task_name}'."
+            )
+            return
+
+        # interleaved streaming output of concurrent tasks is unreadable
+        verbose = not debug and self.workers == 1
+
+        # immutable inputs first (in a canonical order), so that tasks sharing
+        # them also share the prompt prefix; the list of completed tasks differs
+        # per task and goes last
+        history_ = history.copy()
+        if task.required_inputs:
+            history_.append(
+                SystemMessage(
+                    "You will require the following files for your next task:"
+                ).print(verbose)
+            )
+            # large inputs are narrowed down to the passages relevant for the task
+            history_.extend(
+                m.print(verbose)
+                for m in Storage.read_relevant(
+                    sorted(task.required_inputs),
+                    query=f"{task.task_name}\n{task.description}\n{task.deliverable_file.description}",
+                    budget=INPUT_BUDGET_TOKENS,
+                    counter=self.llm.token_counter,
+                )
+            )
+
+        if tasks_completed:
+            texts = "\n".join(
+                [
+                    f"- ✓ {t.task_name} ({t.deliverable_file.file_name})"
+                    for t in tasks_completed
+                ]
+            )
+            history_.append(
+                SystemMessage(
+                    f"You previously completed the following tasks:\n{texts}"
+                ).print(verbose)
+            )
+
+        # tool calls and results pile up over the turns of a task, the inputs above stay
+        compactor = HistoryCompactor(self.llm, head=len(history_))
+        while True:
+            history_ = compactor.compact(history_)
+            resultEvalM, history_ = self.llm.chat(
+                message=message,
+                history=history_,
+                tools=[
+                    Storage.read_file,
+                    Storage.search_files,
+                    Storage.write_file,
+                    Storage.count_words,
+                ],
+                format=ResultEvaluation,
+                verbose=verbose,
+                compactor=compactor,
+            )
+            if Storage.exists(task.deliverable_file.file_name):
+                if resultEvalM.continue_with_next_task:
+                    self._complete(
+                        step, task.deliverable_file.file_name, inputs, fingerprint
                     )
-                    files = Storage.list_files()
-                    if task.deliverable_file.file_name in files:
-                        if resultEvalM.continue_with_next_task:
-                            break
-                        continue
-
-                    if resultEvalM.continue_with_next_task:
-                        history_.append(
-                            SystemMessage(
-                                f"Task '{task.task_name}' is not completed yet. "
-                                f"Please make sure to produce the required file '{task.deliverable_file.file_name}' before continuing."
-                            ).print(not debug)
-                        )
-
-                tasks_completed.append(task)
+                    break
+                continue
+
+            if resultEvalM.continue_with_next_task:
+                history_.append(
+                    SystemMessage(
+                        f"Task '{task.task_name}' is not completed yet. "
+                        f"Please make sure to produce the required file '{task.deliverable_file.file_name}' before continuing."
+                    ).print(verbose)
+                )
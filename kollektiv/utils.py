@@ -7,22 +7,20 @@ from .llm import Storage
 
 
 def save_pydantic_json(obj: BaseModel, file_name: str) -> None:
-    path = os.path.join(Storage.directory, file_name)
-    os.makedirs(Storage.directory, exist_ok=True)
-    content = obj.model_dump_json(indent=2)
-    with open(path, "w", encoding="utf-8") as file:
-        file.write(content)
+    Storage.store(file_name, obj.model_dump_json(indent=2))
 
 
 def load_pydantic_json(file_name: str, model: type) -> BaseModel:
-    path = os.path.join(Storage.directory, file_name)
-    if not os.path.exists(path):
+    content = Storage.content(file_name)
+    if content is None:
         raise FileNotFoundError(
             f"File '{file_name}' not found in '{Storage.directory}'."
         )
-    with open(path, "r", encoding="utf-8") as file:
-        content = file.read()
-    return model.model_validate_json(content, strict=True)
+    # parsed once per version of the file, callers get their own copy
+    parsed = content.derived(
+        ("model", model), lambda text: model.model_validate_json(text, strict=True)
+    )
+    return parsed.model_copy(deep=True)
 
 
 def generate_project_plan_graph(json_file_path: str, output_png_path: str) -> None:
@@ -19,6 +19,6 @@ if __name__ == "__main__":
     #     "Provide client and server files."
     # )
     
-    System(goal=goal).run()
+    System(goal=goal, workers=4, screening_model="qwen3:4b").run()
 
     print("Kollektiv ended.")
@@ -0,0 +1,63 @@
+import os
+import time
+
+from kollektiv.llm.cache import DiskCache, ResponseCache, request_key
+
+
+def _files(directory):
+    return sorted(f for _, _, files in os.walk(directory) for f in files)
+
+
+def test_roundtrip_and_counters(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = DiskCache.make_key("model", [1, 2])
+    assert cache.get(key) is None
+    cache.put(key, {"content": "ü"})
+    assert cache.get(key) == {"content": "ü"}
+    assert (cache.hits, cache.misses) == (1, 1)
+    # written atomically, no temporary files are left behind
+    assert _files(tmp_path) == [f"{key}.json"]
+
+
+def test_expired_entries_are_missing(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    cache.put("key", "value")
+    assert cache.get("key") == "value"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert cache.get("key") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=400)
+    cache.put("aa", "x" * 100)
+    cache.put("bb", "x" * 100)
+    os.utime(cache._path("aa"), (1000, 1000))
+    os.utime(cache._path("bb"), (2000, 2000))
+    # reading refreshes the entry, leaving "bb" as the least recently used
+    assert cache.get("aa") is not None
+
+    cache.put("cc", "x" * 100)
+    assert cache.get("bb") is None
+    assert cache.get("aa") is not None
+    assert cache.get("cc") is not None
+
+
+def test_size_is_restored_on_restart(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.put("aa", "value")
+    assert DiskCache(str(tmp_path))._size == cache._size > 0
+
+
+def test_request_key_ignores_context_size_and_unpinned_seed(tmp_path):
+    request = {
+        "model": "m",
+        "messages": [{"role": "user", "content": "hi"}],
+        "options": {"temperature": 0.2, "seed": 1, "num_ctx": 2048},
+    }
+    other = {**request, "options": {"temperature": 0.2, "seed": 2, "num_ctx": 8192}}
+    assert request_key(request, False) == request_key(other, False)
+    assert request_key(request, True) != request_key(other, True)
+    cache = ResponseCache(str(tmp_path))
+    assert cache.key(request, False) == request_key(request, False)
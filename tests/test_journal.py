@@ -0,0 +1,77 @@
+import json
+import os
+
+from kollektiv.llm.journal import RunJournal
+
+
+def test_replays_entries_per_key_in_recorded_order(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    assert not journal.resumed
+    journal.record("response", "a", content="first")
+    journal.record("response", "b", content="other")
+    journal.record("response", "a", content="second")
+
+    resumed = RunJournal(path)
+    assert resumed.resumed
+    assert resumed.replay("response", "a")["content"] == "first"
+    assert resumed.replay("response", "a")["content"] == "second"
+    assert resumed.replay("response", "a") is None
+    assert resumed.replay("tool", "b") is None
+    assert resumed.replayed == 2
+
+
+def test_drops_torn_tail(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    RunJournal(path).record("response", "a", content="kept")
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"kind": "response", "key": "a", "content": "to')
+
+    journal = RunJournal(path)
+    assert journal.replay("response", "a")["content"] == "kept"
+    assert journal.replay("response", "a") is None
+    with open(path, encoding="utf-8") as file:
+        assert [json.loads(line)["content"] for line in file] == ["kept"]
+
+
+def test_tags_entries_with_step(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    with RunJournal.step("phase2"):
+        journal.record("response", "a", content="tagged")
+    journal.record("response", "b", content="untagged")
+
+    resumed = RunJournal(path)
+    assert resumed.replay("response", "a")["step"] == "phase2"
+    assert "step" not in resumed.replay("response", "b")
+
+
+def test_completed_steps_survive_a_restart(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    (tmp_path / "plan.json").write_text("{}")
+    journal = RunJournal(path)
+    assert journal.completed("phase2") is None
+    journal.complete("phase2", {"plan.json": "abc"}, {"goal.txt": "def"}, "fp")
+
+    entry = RunJournal(path).completed("phase2")
+    assert entry["files"] == {"plan.json": "abc"}
+    assert entry["inputs"] == {"goal.txt": "def"}
+    assert entry["fingerprint"] == "fp"
+
+
+def test_step_with_missing_output_is_not_replayed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    (tmp_path / "plan.json").write_text("{}")
+    journal = RunJournal(path)
+    with RunJournal.step("phase2"):
+        journal.record("response", "a", content="plan")
+    with RunJournal.step("phase3"):
+        journal.record("response", "a", content="deliverables")
+    journal.complete("phase2", {"plan.json": "abc"})
+    os.remove(tmp_path / "plan.json")
+
+    resumed = RunJournal(path)
+    assert resumed.completed("phase2") is None
+    # only the entries of the other steps are left to replay
+    assert resumed.replay("response", "a")["content"] == "deliverables"
+    assert resumed.replay("response", "a") is None
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from kollektiv.models.models_phase3_deliverables import DeliverableFile
+from kollektiv.models.models_phase4_deliverable_tasks import (
+    ProjectPhaseWithTasks,
+    ProjectWithTasks,
+    Task,
+)
+from kollektiv.scheduler import TaskGraph, TaskScheduler
+
+
+def _task(output: str, *inputs: str) -> Task:
+    return Task(
+        task_name=output,
+        description="",
+        required_inputs=list(inputs),
+        deliverable_file=DeliverableFile(file_name=output, description=""),
+    )
+
+
+def _plan(*phases: list[Task]) -> ProjectWithTasks:
+    return ProjectWithTasks(
+        overarching_goal="",
+        description="",
+        project_phases=[
+            ProjectPhaseWithTasks(
+                phase_name=f"phase {i}",
+                description="",
+                required_inputs=[],
+                deliverable_files=[],
+                tasks=tasks,
+            )
+            for i, tasks in enumerate(phases)
+        ],
+    )
+
+
+def test_dependencies_follow_files():
+    graph = TaskGraph.from_plan(
+        _plan(
+            [_task("a.md"), _task("b.md")],
+            [_task("c.md", "a.md", "missing.md"), _task("a.md", "b.md")],
+        )
+    )
+    assert [n.depends_on for n in graph.nodes] == [set(), set(), {0}, {0, 1, 2}]
+    assert graph.nodes[0].dependents == {2, 3}
+    assert graph.critical_path_length() == 3
+
+
+def test_ancestors_are_transitive_and_in_plan_order():
+    graph = TaskGraph.from_plan(
+        _plan(
+            [_task("a.md"), _task("b.md")],
+            [_task("c.md", "a.md"), _task("d.md", "c.md")],
+        )
+    )
+    assert [n.index for n in graph.ancestors(3)] == [0, 2]
+    assert graph.ancestors(1) == []
+
+
+def test_independent_tasks_run_concurrently():
+    graph = TaskGraph.from_plan(_plan([_task("a.md"), _task("b.md")]))
+    barrier = threading.Barrier(2, timeout=5)
+    TaskScheduler(graph, workers=2).run(lambda node: barrier.wait())
+
+
+def test_tasks_run_after_their_dependencies():
+    graph = TaskGraph.from_plan(
+        _plan(
+            [_task("a.md"), _task("b.md", "a.md"), _task("c.md")],
+            [_task("d.md", "b.md", "c.md")],
+        )
+    )
+    started, done = [], []
+    lock = threading.Lock()
+
+    def perform(node):
+        with lock:
+            assert node.depends_on <= set(done)
+            started.append(node.index)
+
+    TaskScheduler(graph, workers=3).run(perform, on_done=lambda n: done.append(n.index))
+    assert sorted(started) == [0, 1, 2, 3]
+    assert done.index(1) < done.index(3) and done.index(2) < done.index(3)
+
+
+def test_failure_stops_dependents_and_is_raised():
+    graph = TaskGraph.from_plan(_plan([_task("a.md"), _task("b.md", "a.md")]))
+    performed = []
+
+    def perform(node):
+        performed.append(node.index)
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        TaskScheduler(graph).run(perform)
+    assert performed == [0]
@@ -0,0 +1,29 @@
+from kollektiv.llm.cache import WebCache, normalize_query, normalize_url
+
+
+def test_normalize_url_strips_only_tracking_parameters():
+    assert (
+        normalize_url("HTTPS://Example.com:443/a?b=1&utm_source=x&gclid=y&ref=z#top")
+        == "https://example.com/a?b=1&ref=z"
+    )
+    assert normalize_url("http://example.com:8080?fbclid=1&msclkid=2") == (
+        "http://example.com:8080/"
+    )
+
+
+def test_normalize_url_keeps_the_path():
+    assert normalize_url("https://example.com/docs/") == "https://example.com/docs/"
+    assert normalize_url("https://example.com/docs") == "https://example.com/docs"
+
+
+def test_keys_of_equivalent_requests_match():
+    assert WebCache.url_key("https://example.com/?b=2&a=1") == WebCache.url_key(
+        "https://EXAMPLE.com/?a=1&b=2&utm_medium=mail"
+    )
+    assert normalize_query("  Rust   Async ") == normalize_query("rust async")
+    assert WebCache.search_key("rust", 5) != WebCache.search_key("rust", 10)
+
+
+def test_offline_cache_never_expires(tmp_path):
+    assert WebCache(str(tmp_path), offline=True).html.ttl is None
+    assert WebCache(str(tmp_path)).html.ttl is not None